@@ -0,0 +1,71 @@
+#!/usr/local/bin/python
+
+#
+# Compares two ways of checking many command lines against one arglist:
+# building a fresh arguments instance and calling getargs() for each line,
+# and parsing all of them with parsemany() on a single instance.
+#
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import getargs
+
+
+def makespec(nopts):
+    arglist = [
+        ("name", "", "A string option", None),
+        ("count", 0, "An integer option", None),
+        ("ratio", 0.0, "A float option", None),
+        ("files", [], "A list option", None),
+        ("verbose", None, "A boolean option", None),
+    ]
+    for n in range(nopts):
+        arglist.append(("opt%d" % (n), "", "Filler option %d" % (n), None))
+    return tuple(arglist)
+
+
+def makelines(nlines):
+    lines = []
+    for n in range(nlines):
+        lines.append(
+            ["job", "-name", "job%d" % (n), "-count", "%d" % (n % 97), "-ratio=0.25", "-files", "a b c", "-v", "input%d" % (n)]
+        )
+    return lines
+
+
+def percall(arglist, lines):
+    for argv in lines:
+        xarg = getargs.arguments("-", arglist)
+        xarg.getargs(argv)
+
+
+def batch(arglist, lines):
+    xarg = getargs.arguments("-", arglist)
+    for res in xarg.parsemany(lines):
+        pass
+
+
+if __name__ == "__main__":
+    arglist = (
+        ("lines", 0, "Number of command lines", 20000),
+        ("options", 0, "Number of filler options in the arglist", 50),
+        ("repeat", 0, "Best of this many runs", 3),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, sys.argv = xarg.getargs(sys.argv)
+
+    spec = makespec(xarg.value("options"))
+    lines = makelines(xarg.value("lines"))
+    print "%d lines, %d options" % (len(lines), len(spec))
+    for name, func in (("construct+getargs", percall), ("parsemany", batch)):
+        best = None
+        for r in range(xarg.value("repeat")):
+            t0 = time.time()
+            func(spec, lines)
+            t = time.time() - t0
+            if best == None or t < best:
+                best = t
+        print "%20s %10.4f s %12.0f lines/s" % (name, best, len(lines) / best)
@@ -0,0 +1,68 @@
+#!/usr/local/bin/python
+
+#
+# Measures what importing getargs costs a short-lived process: the wall
+# time of starting the interpreter and importing the module, against
+# starting it bare, and the modules and file descriptors the import
+# leaves behind.  (-X importtime does not exist in Python 2, so each
+# figure is the best of several fresh interpreters.)  Given
+# -baseline <dir>, the same figures are taken for the getargs package
+# in <dir>.
+#
+
+import sys
+import os
+import time
+import subprocess
+
+here = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, here)
+import getargs
+
+probe = """
+import os, sys
+def fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+m = len(sys.modules)
+f = fds()
+sys.path.insert(0, %r)
+import getargs
+print len(sys.modules) - m, fds() - f
+"""
+
+
+def best(cmd, repeat):
+    b = None
+    for r in range(repeat):
+        t0 = time.time()
+        subprocess.call(cmd)
+        t = time.time() - t0
+        if b == None or t < b:
+            b = t
+    return b
+
+
+if __name__ == "__main__":
+    arglist = (
+        ("repeat", 0, "Best of this many interpreter starts", 20),
+        ("baseline", "", "Directory holding a getargs package to compare against", None),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, sys.argv = xarg.getargs(sys.argv)
+
+    places = [("current", here)]
+    if xarg.value("baseline"):
+        places.append(("baseline", xarg.value("baseline")))
+
+    bare = best([sys.executable, "-S", "-c", "pass"], xarg.value("repeat"))
+    print "%-10s %10s %10s %8s %6s" % ("", "start ms", "import ms", "modules", "fds")
+    print "%-10s %10.2f" % ("bare", bare * 1000)
+    for name, where in places:
+        code = "import sys; sys.path.insert(0, %r); import getargs" % (where)
+        t = best([sys.executable, "-S", "-c", code], xarg.value("repeat"))
+        p = subprocess.Popen([sys.executable, "-S", "-c", probe % (where)], stdout=subprocess.PIPE)
+        mods, fds = p.communicate()[0].split()
+        print "%-10s %10.2f %10.2f %8s %6s" % (name, t * 1000, (t - bare) * 1000, mods, fds)
@@ -0,0 +1,123 @@
+#!/usr/local/bin/python
+
+#
+# Times the numeric checks and conversions done for every value of an
+# integer, long or float option: the character-by-character isnumber(),
+# islong() and isfloat() the module used to have, followed by string.atoi()
+# and friends, against today's convint(), convlong() and convfloat().  Also
+# lists the tokens the two disagree on.
+#
+
+import sys
+import os
+import string
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import getargs
+
+
+def oldisnumber(s):
+    for c in s:
+        if c in string.digits or c in "-+":
+            pass
+        else:
+            return 0
+    return 1
+
+
+def oldislong(s):
+    for c in s:
+        if c in string.digits or c in "-+" or c in "L":
+            pass
+        else:
+            return 0
+    return 1
+
+
+def oldisfloat(s):
+    for c in s:
+        if c in string.digits or c in "-+.eE":
+            pass
+        else:
+            return 0
+    return 1
+
+
+def oldconvint(s, sep):
+    if not oldisnumber(s):
+        raise ValueError(s)
+    return string.atoi(s)
+
+
+def oldconvlong(s, sep):
+    if not oldislong(s):
+        raise ValueError(s)
+    return string.atol(s)
+
+
+def oldconvfloat(s, sep):
+    if not oldisfloat(s):
+        raise ValueError(s)
+    return string.atof(s)
+
+
+tokens = {
+    "int": ["7", "1582", "-42", "+3", "123456789", "x", "+-+", "12a", ""],
+    "long": ["7", "1752L", "-42", "123456789012345678901234567890L", "L", "+-+", "1.5"],
+    "float": ["3.14159", "1e5", "-2.5E-3", ".5", "42", "1e.e", "+-+", "inf", "1.2.3"],
+}
+
+pairs = {
+    "int": (oldisnumber, oldconvint, getargs.isnumber, getargs.convint),
+    "long": (oldislong, oldconvlong, getargs.islong, getargs.convlong),
+    "float": (oldisfloat, oldconvfloat, getargs.isfloat, getargs.convfloat),
+}
+
+
+def timeit(func, toks, n):
+    t0 = time.time()
+    for r in xrange(n):
+        for s in toks:
+            try:
+                func(s, None)
+            except ValueError:
+                pass
+    return time.time() - t0
+
+
+def check(func, toks, n):
+    t0 = time.time()
+    for r in xrange(n):
+        for s in toks:
+            func(s)
+    return time.time() - t0
+
+
+if __name__ == "__main__":
+    arglist = (
+        ("rounds", 0, "Passes over the token list", 100000),
+        ("repeat", 0, "Best of this many runs", 3),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, sys.argv = xarg.getargs(sys.argv)
+    n = xarg.value("rounds")
+
+    for kind in ("int", "long", "float"):
+        oldis, oldconv, newis, newconv = pairs[kind]
+        toks = tokens[kind]
+        for s in toks:
+            if oldis(s) != newis(s):
+                print "%-5s %-10r old is%s %d, new %d" % (kind, s, kind, oldis(s), newis(s))
+        for name, func, timer in (
+            ("old is", oldis, check),
+            ("new is", newis, check),
+            ("old conv", oldconv, timeit),
+            ("new conv", newconv, timeit),
+        ):
+            best = None
+            for r in range(xarg.value("repeat")):
+                t = timer(func, toks, n)
+                if best == None or t < best:
+                    best = t
+            print "%-5s %-9s %8.4f s %8.0f ns/token" % (kind, name, best, best * 1e9 / (n * len(toks)))
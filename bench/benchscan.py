@@ -0,0 +1,81 @@
+#!/usr/local/bin/python
+
+#
+# Times arguments.getargs() on command lines of growing length, to show
+# how the cost of a parse scales with the number of tokens.  Given
+# -baseline <dir>, where <dir> holds another checkout's getargs package,
+# the same command lines are also run through that copy, side by side.
+#
+
+import sys
+import os
+import imp
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import getargs
+
+
+def load(name, where):
+    f, path, desc = imp.find_module("getargs", [where])
+    return imp.load_module(name, f, path, desc)
+
+
+def makespec(mod):
+    return (
+        ("name", "", "A string option", None),
+        ("count", 0, "An integer option", None),
+        ("ratio", 0.0, "A float option", None),
+        ("files", [], "A list option", None),
+        ("output", mod.nofile, "A file option", None),
+        ("verbose", None, "A boolean option", None),
+    )
+
+
+def makeargv(reps):
+    argv = ["bench"]
+    for n in range(reps):
+        argv.extend(["-name", "x%d" % (n), "-count", "%d" % (n), "-ratio=0.5", "-files", "a b c", "-output", "/dev/null", "-v"])
+    argv.append("operand")
+    return argv
+
+
+def timeit(mod, argv, repeat):
+    best = None
+    for r in range(repeat):
+        xarg = mod.arguments("-", makespec(mod))
+        t0 = time.time()
+        pn, rest = xarg.getargs(argv)
+        t = time.time() - t0
+        if best == None or t < best:
+            best = t
+    return best
+
+
+if __name__ == "__main__":
+    arglist = (
+        ("start", 0, "Smallest number of option groups", 250),
+        ("steps", 0, "Number of doublings", 5),
+        ("repeat", 0, "Best of this many runs", 3),
+        ("baseline", "", "Directory holding a getargs package to compare against", None),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, sys.argv = xarg.getargs(sys.argv)
+
+    mods = [("current", getargs)]
+    if xarg.value("baseline"):
+        mods.append(("baseline", load("getargs_baseline", xarg.value("baseline"))))
+
+    print "%10s" % ("tokens"),
+    for name, mod in mods:
+        print "%14s %10s" % (name + " s", "us/token"),
+    print
+    reps = xarg.value("start")
+    for step in range(xarg.value("steps")):
+        argv = makeargv(reps)
+        print "%10d" % (len(argv)),
+        for name, mod in mods:
+            t = timeit(mod, argv, xarg.value("repeat"))
+            print "%14.4f %10.2f" % (t, t * 1e6 / len(argv)),
+        print
+        reps = reps * 2
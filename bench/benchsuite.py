@@ -0,0 +1,209 @@
+#!/usr/local/bin/python
+
+#
+# The benchmark suite: builds synthetic arglists with the same number of
+# options of every type (boolean, 0j, int, long, float, string, nofile,
+# list, tuple, nofunc), and times constructing an arguments instance,
+# getargs() on command lines of several lengths, matchlongarg(), value(),
+# __repr__ (first and repeated) and importing the module.  Everything is
+# generated from a fixed seed, so runs are comparable.
+#
+# Results go to a JSON file with -output; -compare <file> prints each
+# figure against the same figure in an earlier results file.  -path <dir>
+# times the getargs package in <dir> instead of this checkout's, so an
+# older commit can be measured without checking it out here.
+#
+
+import sys
+import os
+import imp
+import time
+import random
+import subprocess
+
+here = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, here)
+import getargs
+
+try:
+    import json
+except ImportError:
+    json = None
+
+
+def load(where):
+    f, path, desc = imp.find_module("getargs", [where])
+    return imp.load_module("getargs_bench", f, path, desc)
+
+
+def noop(let):
+    pass
+
+
+# Option name prefix, type and the words that give such an option a value
+# on the command line (None for 0j counters, which can only be given as
+# single letters and so are never put on a generated command line).
+def kinds(mod):
+    return (
+        ("bool", None, []),
+        ("count", 0j, None),
+        ("int", 0, ["42"]),
+        ("long", 0L, ["1752"]),
+        ("float", 0.0, ["2.5"]),
+        ("str", "", ["text"]),
+        ("file", mod.nofile, ["/dev/null"]),
+        ("list", [], ["a b c"]),
+        ("tuple", (), ["a b c"]),
+        ("func", mod.nofunc, []),
+    )
+
+
+def makespec(mod, n):
+    arglist = []
+    for name, typ, words in kinds(mod):
+        for k in range(n):
+            v = None
+            if typ == mod.nofunc:
+                v = noop
+            arglist.append(("%s%d" % (name, k), typ, "A %s option, number %d" % (name, k), v))
+    return tuple(arglist)
+
+
+def makeargv(mod, n, ntokens, rnd):
+    choices = [(name, words) for name, typ, words in kinds(mod) if words != None]
+    argv = ["bench"]
+    while len(argv) < ntokens:
+        name, words = rnd.choice(choices)
+        argv.append("-%s%d" % (name, rnd.randrange(n)))
+        argv.extend(words)
+    argv.append("operand")
+    return argv
+
+
+def best(setup, run, repeat):
+    b = None
+    for r in range(repeat):
+        state = setup()
+        t0 = time.time()
+        run(state)
+        t = time.time() - t0
+        if b == None or t < b:
+            b = t
+    return b
+
+
+def bench(mod, sizes, tokens, repeat, where):
+    results = []
+
+    def note(name, n, count, t, **extra):
+        r = {"bench": name, "options": n, "count": count, "seconds": t, "per": t / max(count, 1)}
+        r.update(extra)
+        results.append(r)
+        print "%-12s %8s %8d %12.6f s %12.3f us" % (name, n, count, t, r["per"] * 1e6)
+
+    for n in sizes:
+        spec = makespec(mod, n)
+        rnd = random.Random(n)
+        keys = [i[0] for i in spec]
+        sample = rnd.sample(keys, min(len(keys), 1000))
+        words = sample + [k[:-1] for k in sample if len(k) > 1]
+
+        def fresh():
+            return mod.arguments("-", spec)
+
+        note("construct", n, len(spec), best(lambda: None, lambda s: fresh(), repeat))
+        for ntok in tokens:
+            argv = makeargv(mod, n, ntok, rnd)
+            note("getargs", n, len(argv), best(fresh, lambda x: x.getargs(argv), repeat), tokens=ntok)
+        x = fresh()
+
+        def match(x):
+            for w in words:
+                x.matchlongarg(w)
+
+        note("matchlongarg", n, len(words), best(lambda: x, match, repeat))
+
+        def value(x):
+            for k in keys:
+                x.value(k)
+
+        note("value", n, len(keys), best(lambda: x, value, repeat))
+        note("repr", n, len(keys), best(fresh, repr, repeat))
+        x = fresh()
+        repr(x)
+        note("repr-again", n, len(keys), best(lambda: x, repr, repeat))
+
+    probe = "import sys; sys.path.insert(0, %r); import getargs" % (where)
+    bare = best(lambda: None, lambda s: subprocess.call([sys.executable, "-c", "pass"]), repeat * 5)
+    t = best(lambda: None, lambda s: subprocess.call([sys.executable, "-c", probe]), repeat * 5)
+    note("import", "-", 1, max(t - bare, 0.0), start=bare)
+    return results
+
+
+def compare(results, fname):
+    old = {}
+    for r in json.load(open(fname))["results"]:
+        old[(r["bench"], r["options"], r.get("tokens"))] = r
+    print
+    print "%-12s %8s %8s %12s %12s %8s" % ("bench", "options", "tokens", "old s", "new s", "new/old")
+    for r in results:
+        o = old.get((r["bench"], r["options"], r.get("tokens")))
+        if o == None or o["seconds"] <= 0:
+            continue
+        print "%-12s %8s %8s %12.6f %12.6f %8.2f" % (
+            r["bench"],
+            r["options"],
+            r.get("tokens", ""),
+            o["seconds"],
+            r["seconds"],
+            r["seconds"] / o["seconds"],
+        )
+
+
+if __name__ == "__main__":
+    arglist = (
+        ("sizes", [], "Numbers of options of each type", ["10", "100", "1000"]),
+        ("tokens", [], "Command line lengths to parse", ["10", "100", "1000"]),
+        ("repeat", 0, "Best of this many runs", 3),
+        ("path", "", "Directory holding the getargs package to time", None),
+        ("output", "", "Write the results to this JSON file", None),
+        ("compare", "", "Compare against this earlier JSON results file", None),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, sys.argv = xarg.getargs(sys.argv)
+    if json == None and (xarg.value("output") or xarg.value("compare")):
+        print "%s: -output and -compare need the json module" % (progname)
+        sys.exit(1)
+
+    where = here
+    mod = getargs
+    if xarg.value("path"):
+        where = os.path.abspath(xarg.value("path"))
+        mod = load(where)
+    sizes = [int(s) for s in xarg.value("sizes")]
+    tokens = [int(s) for s in xarg.value("tokens")]
+
+    results = bench(mod, sizes, tokens, xarg.value("repeat"), where)
+    if xarg.value("output"):
+        rev = None
+        try:
+            p = subprocess.Popen(["git", "rev-parse", "HEAD"], cwd=where, stdout=subprocess.PIPE, stderr=open(os.devnull, "w"))
+            rev = p.communicate()[0].strip() or None
+        except OSError:
+            pass
+        doc = {
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "path": where,
+            "commit": rev,
+            "sizes": sizes,
+            "tokens": tokens,
+            "repeat": xarg.value("repeat"),
+            "results": results,
+        }
+        fp = open(xarg.value("output"), "w")
+        json.dump(doc, fp, indent=1, sort_keys=True)
+        fp.write("\n")
+        fp.close()
+    if xarg.value("compare"):
+        compare(results, xarg.value("compare"))
@@ -60,11 +60,17 @@ ARGLIST FIELDS
         'a b c d e', which is returned as a tuple
         []    == Requires a list of arguments, usually of the form
         'a b c d e', which is returned as a list
+        lazytuple, lazylist == The same as () and [], except that the
+        value is split up only as it is used; see below;
+        intarray == Requires a list of integers, usually of the form
+        '1 2 3 4 5', which is returned as a NumPy array;
+        floatarray == The same for floating point numbers;
     docstring = String that represents the hint the user sees, as in:
         "Print a help message and exit"
     value = The default value; if this is not provided, None will be used.
     mode = Used for file options only; provides the second argument to open();
-        defaults to "r".
+        defaults to "r".  The special mode "m" asks for the file to be
+        memory-mapped for reading instead; see open().
 
     SINGLE LETTER OPTIONS
     Single letter options that take arguments (non-boolean) may do so in one of
@@ -90,6 +96,57 @@ ARGLIST FIELDS
 
     for example.
 
+    The value is split up when the command line is parsed, into an ordinary
+    list or tuple.  For very long lists of which only a few elements may be
+    looked at, use the type lazylist or lazytuple instead: then the value is
+    not split up when the command line is parsed.  It is an
+    instance of class splitseq, which cuts each element out of the string
+    only when it is asked for: iterating over it, or taking one of its
+    first few elements, costs no more than those elements, and the first
+    index beyond them notes where every element starts and ends, after which
+    len(), indexing and slicing are quick.  It compares (for equality and
+    for order), prints like, and can be indexed, sliced, searched with
+    index(), added and counted like the list or tuple it stands in for;
+    a list value changed in place (by append(),
+    sort(), assignment to an element and so on) becomes an ordinary list
+    first.  list ( value ) or tuple ( value ) gives the real thing, which is
+    what isinstance() and anything else that checks the type will want.
+
+    ARRAY ARGUMENTS
+    Options of type intarray or floatarray take a list of numbers, separated
+    in the same way, and turn it into a one-dimensional NumPy array of ints
+    or floats with a single call to numpy.fromstring(), which is much
+    quicker than converting a long list one string at a time.  NumPy is
+    imported the first time such an option is given a value, so programs
+    that don't use these types don't need it.  A list with anything in it
+    that isn't a number, or an empty element, is a missing value, as for
+    numeric options.  setvalue() accepts an array or any sequence of
+    numbers, which is converted to an array of the right type; it turns
+    away strings, floats for an intarray, and nan and infinities for a
+    floatarray, which reach it from JSON config files too.
+    Each element is read as the value of an integer or float option is,
+    except that white space around it is ignored, and every element of a
+    floatarray must be finite: "nan", "inf" and numbers too big for a
+    float are turned away.
+
+    RESPONSE FILES
+    Command lines can be longer than the system allows.  If the programmer
+    calls setresp ( '@' ), a token of the form '@file' stands for the words
+    in file, which are read as the parser gets to them and may themselves
+    include '@file' tokens.  Words in a response file are separated by white
+    space or, if the file contains a NUL character, by NULs; that is how to
+    put spaces in words.  Empty words are skipped.
+
+    The exception is the value of a list or tuple option: '-files @list' or
+    '-files=@list' makes the value a sequence of the words in list, which
+    is read from the file afresh each time it is iterated over, so that even
+    a very long list never has to be held in memory.  Here words are
+    separated by line ends and the list separator (any white space, if that
+    hasn't been set with setsep()), or again by NULs.  Such a value can be
+    iterated over, indexed, sliced and compared like a list or tuple, but
+    each of those reads the file; len() reads it once.  list ( value )
+    gives an ordinary list.
+
     ORDER
     The order of options is not significant.  You cannot tell if one option has been
     set on the command line before another; this should not be a problem.
@@ -106,8 +163,59 @@ ARGLIST FIELDS
 
     FILE OPTIONS
     The type of these is determined by matching against the value 'nofile',
-    which is defined to be the same as the value returned by 'open("/dev/null", "r")'; if
-    users are on a PC or on a Mac, they won't have "/dev/null", so "nul" is used instead.
+    which is the only instance of the otherwise empty class filetype.  (It
+    used to be an open file, "/dev/null" or "nul"; arglists that still use
+    an open file as the type of a file option are treated as if they said
+    nofile.)
+
+    ERRORS
+    What is wrong with a command line (an unlisted option, a missing or
+    bad value, a response file that can't be read) is printed, and
+    parsing carries on, as it always has.  Each complaint is also an
+    instance of class argerror, a ValueError with the attributes
+
+        what      "unlisted", "missing", "flag", "type", "respfile",
+                  "config" or "exception";
+        position  the index in argv of the token at fault (for a word
+                  read from a response file, of the '@file' token);
+        key       the option letter or word;
+        expected  the type the option wanted;
+        token     the token or value that was offered;
+
+    and str() of it is the message that is printed.  The complaints
+    about the latest command line are kept in the errors attribute of
+    the arguments instance for getargs() and iterparse(), or of the
+    parseresult for parse().  seterrormode() chooses what else happens:
+    "print" (the default) prints them, "collect" doesn't, and "raise"
+    doesn't either, but raises argerrors, whose errors attribute is the
+    list, when the parse is over.  The parser checks each value it
+    converts against the option's type, and reports one that doesn't
+    fit (an integer too big for an int, or whatever an addtype()
+    converter got wrong) as a missing value, with its position.  So
+    only setvalue() called by the program itself, in "raise" mode,
+    raises the argerror for a value of the wrong type at once.  parse() can be
+    given a mode for just that command line.
+
+    ENVIRONMENT AND CONFIG FILES
+    getsources() sets options from a config file and from environment
+    variables as well as from the command line.  An option given in
+    more than one place takes its value from the command line, failing
+    that from its environment variable, and failing that from the
+    config file; the arglist default stands if none of them has it.
+    Each option is set only once, from the source that wins.  Only the
+    options given an environment variable with setenvvar() are looked
+    up in the environment.
+
+    A config file whose name ends in ".json" holds a JSON object, whose
+    keys are option keys; any other file is an INI file, as read by
+    ConfigParser, with an option key (case sensitive) on each line of
+    its sections.  Strings are converted as they are on the command
+    line, so '-count 7', count=7 in an INI file and TOOL_COUNT=7 in the
+    environment all mean the same.  Boolean options take 1, true, yes
+    or on for 1, and 0, false, no, off or nothing for 0; counters take
+    a number, which is added to the count.  In a JSON file, numbers,
+    true and false and lists of strings can be used as they are.
+    Function options can't be set this way.
 
     DETERMINING IF AN OPTION HAS APPEARED ON THE COMMAND LINE
     If the programmer provides a default value other than None, then there is no
@@ -117,46 +225,266 @@ ARGLIST FIELDS
     options, since the only way for one to be set this way is in the arglist;
     all other methods set the value to either 0 or 1.
 
-    VARIABLE
-    The only variable in the getargs module is 'nofile', which is used only to
-    find the type of file options.
+    VARIABLES
+    'nofile', 'intarray', 'floatarray', 'lazylist' and 'lazytuple' are
+    used only as the types of file, array and lazy list options in
+    arglists.  Each is the only instance of an otherwise empty class
+    (filetype, intarraytype, floatarraytype, lazylisttype and
+    lazytupletype), and nofile is no longer an open file, so importing getargs opens no
+    files.
+
+    'valuetypes' is the table, filled in by addtype(), that says how
+    options of each type are handled: it maps type ( typ ) to a record
+    of the hint argtype() shows, the converter that checks and converts
+    a value from the command line, the flag function for options that
+    take no value, and the function that stores what is found.  Each
+    option looks its type up once, when it is added; getargs() then
+    calls the converter, which raises ValueError for a bad value, and
+    setvalue() checks the converted value against the option's type.
+    There are no separate checks for each type.
+
+    'VERSION' is the version string below.
 
     FUNCTIONS
     Functions provided by the getargs module are:
 
         nofunc()    Provided to find the type of function options.
         isnumber()  Used to determine if a string can be converted into an
-        integer; the string can contain only digits or '-' or '+'.
-        islong()    Same as isnumber(), except the string can also contain
+        integer; the string must be digits, with an optional leading '-'
+        or '+', and the number small enough for an int.
+        islong()    Same as isnumber(), except the string can also end in
         the letter 'L'.
-        isfloat()   The string contains digits, a period, signs or the letters
-        'e' or 'E'.
+        isfloat()   The string is a floating point number: digits with an
+        optional sign, period and exponent ('e' or 'E', optional sign,
+        digits), and no white space.
+        These are exactly the strings that integer, long and float options
+        accept: each just tries convint(), convlong() or convfloat(), the
+        converters those options use.
         manpage()   Returns the __doc__ attribute for the getargs module.
+        mapfile ( fname ) :
+        Returns a read-only mmap of the file fname, or the file opened
+        with mode "rb" if it can't be mapped.  Used by open() for files
+        with mode "m".
+        openfile ( fname, mode, offset = None, prefetch = 0 ) :
+        Opens fname the way open() does: mapped if mode is "m", with the
+        built-in open() otherwise, at offset if that is given, and with up
+        to prefetch bytes read ahead (and discarded) if it is opened for
+        reading.
+        threadpool ( ) :
+        Returns the pool of eight threads aopen() uses, a
+        multiprocessing.pool.ThreadPool started the first time it is
+        needed.
+        compindex ( fname ) :
+        Returns the saved state in the spec cache file fname (see
+        specdump()), for complete(), or None if fname can't be read or
+        isn't a spec cache file.  No arguments instance is built.
+        complete ( state, word, prev = None ) :
+        Completes word, the word being typed on a command line, given
+        prev, the word before it, and state, as returned by compindex().
+        Returns ( hint, candidates ).  If word starts with the switch
+        character, candidates are the options it is a prefix of, sorted,
+        each with the switch character in front, and hint is None.  If
+        word is the value of an option, either after an eq character or
+        in the word after the option, candidates is empty and hint is
+        what argtype() returns for the option ("" for string options);
+        the option is matched as matchlongarg() matches it.  Otherwise
+        there is nothing to complete, and the result is ( None, [] ).
+        compscript ( shell, prog, cachefile, python = None ) :
+        Returns a completion function for the program prog, for shell
+        "bash" or "zsh", that answers each query by running
+        "python -m getargs -complete cachefile" (with the python that is
+        running now, if python isn't given).  cachefile is a spec cache
+        file for prog's arglist, as written by specdump() or speccache().
+        Options are completed; so are the values of file options, as file
+        names.  For the values of other options the function shows the
+        hint complete() returns ("#", "#.#", "<list>" and so on), without
+        putting it on the command line, except that anything may be typed
+        for string options, so their values get the shell's own
+        completion.
+        readconfig ( fname, section = None, cachefile = None ) :
+        Returns the dictionary of the keys and values in the config file
+        fname (see getsources()); don't change it.  The dictionary, one
+        for each section read, is kept and returned again without reading
+        the file for as long as the file's modification time and size
+        stay the same.  Given cachefile, it is also saved there, as a
+        marshal string checked in the same way, so that later runs of
+        the program don't parse the file again either.  Raises EnvironmentError if fname can't
+        be read and ValueError if it can't be parsed.
+        parseconfig ( fname, section = None ) :
+        Reads and parses fname for readconfig(), every time.
+        addwatcher ( watchers, let, func ),
+        dropwatcher ( watchers, let, func = None ),
+        samevalue ( a, b ) :
+        Used by watch(), unwatch() and update().
+        writefile ( fname, data ) :
+        Writes the string data to fname by way of a temporary file that
+        is renamed into place, as speccache() and readconfig() do;
+        returns 1, or 0 if that couldn't be done.
+        speccache ( fname, c, arglist ) :
+        Returns arguments ( c, arglist ), loaded from the spec cache file
+        fname if that was written for the same c and arglist, and built
+        in the usual way (and then saved in fname) if not.  Loading skips
+        setargs(): the option records, sorted keys, help widths and the
+        prefix index matchlongarg() uses all come out of the file ready
+        made, which makes starting a program with a long arglist, and
+        parsing its first command line, quicker: about 4ms instead of 7ms
+        for 1,000 long options.  If fname can't be written, or arglist holds a
+        value that can't be saved (see specdump()), the instance is just
+        built.
+        specdigest ( c, arglist ) :
+        Returns the hex digest speccache() checks the file against:
+        an MD5 of c and of repr ( arglist ) with any " at 0x..."
+        addresses taken out, so that it is the same in every process,
+        and of the module and name of each function in arglist.
+        specdump ( xarg, digest = None ) :
+        Returns the arguments instance xarg as a marshal string, with
+        digest recorded in it.  Types and values that marshal can't hold
+        are saved by name: nofile, intarray and floatarray, and functions
+        and other objects as the module and name they can be imported
+        from (so lambdas and nested functions can't be saved; they raise
+        ValueError).  Each option's current value is saved as its
+        value, and so are the separator, paren, eq and response
+        characters, the error mode, maxfiles() and setenvvar() names; open
+        files and freeze() are not.  What argtype() returns for each option is
+        saved too, for complete().
+        specload ( data, digest = None ) :
+        Returns a new arguments instance made from the string data, as
+        written by specdump(), or None if data is not such a string, if
+        a function or object it names can't be imported, or, when digest
+        is given, if it was written with a different digest.
+        validate ( spec, fp, procs = None, nul = 0, size = 1000 ) :
+        A generator that checks every command line recorded in the open
+        file fp against spec, an arguments instance, and yields one tuple
+        per non-blank line, in input order:
+
+            ( lineno, argv, values, remainder, errors )
+
+        where argv is the line split into words as a shell would split
+        it, values is a dictionary of the options the line sets (function
+        options are not called, but show up with the value 1), remainder
+        is what getargs() would have left in argv, and errors is a list
+        of the argerror instances parsing produced, empty if the line is
+        good.  Nothing is printed.
+        Lines are newline-terminated, or NUL-terminated if nul is true.
+        The work is spread over procs processes (by default one per CPU)
+        in blocks of size lines; procs = 1 does it all in the calling
+        process.  spec is handed to each process once, so it has to be
+        picklable: functions in its arglist must be defined at the top
+        level of a module.
+
+        The same thing is available from the command line:
+
+            python -m getargs -spec module:name [-procs n] [-nul] [-all] file
+
+        where name is an arguments instance or an arglist in module.
+        addtype ( typ, hint, conv = None, flag = flagskip, apply = storevalue ) :
+        Registers a new option type, where:
+            typ   = the value used as the type in arglists; options
+                    match it by type(typ);
+            hint  = the string argtype() returns for it;
+            conv  = a function conv ( s, sep ) that turns the string s
+                    from the command line into the value to store, or
+                    raises ValueError; the list separator is passed in
+                    sep.  The value must pass setvalue();
+            flag  = for options that take no value (conv is None), a
+                    function flag ( t, let, longopt ) called when the
+                    option is found, with its record t, which returns
+                    the value of the option, None to ignore it, or
+                    raises ValueError;
+            apply = a function apply ( xarg, let, v ) that stores the
+                    value v found for option let in xarg, an arguments
+                    or parseresult instance; by default, storevalue(),
+                    which calls xarg.setvalue().
+        The built-in types are registered in the same way, using the
+        conv...() and flag...() functions and, for function options,
+        callvalue(), which calls xarg.callfunc() instead; arguments
+        instances compile each option against this table when it is
+        added.
 
     CLASS
-    The only class provided by getargs is class arguments.
+    The only class you need from getargs is class arguments.  Class
+    prefixindex is the character trie used by matchlongarg(); you
+    shouldn't ordinarily need to use it.
+
+    Each option is held in the args dictionary of an arguments instance
+    as an instance of class option, a compact record with the attributes
+    type, docstring, value, mode and, once a file has been opened, fp.
+    Records can also be subscripted by those names, as in
+    xarg.args[ 'i' ][ 'value' ], so code written against the old
+    dictionary-of-dictionaries layout keeps working.
+
+    Class parseresult holds the outcome of arguments.parse(); see parse()
+    and update() below.  Classes splitseq and respseq are the values of
+    lazylist and lazytuple options given on the command line, and of any
+    list or tuple option read from a response file; they
+    and class lazyseq, their base class, behave like the list or tuple they
+    stand in for.  Class argstream hands the parser its
+    tokens.  Classes argerror and argerrors are described under ERRORS
+    above.
+
+    Class phasetimer counts and times the work of one or more arguments
+    instances, phase by phase, when profiling is turned on; see
+    setprofiler() below.  Its methods are:
+
+        add ( self, phase, key, start ) :
+        Counts one pass through phase for option key (which may be None)
+        that began at clock() reading start, and calls the hooks.
+        addhook ( self, hook ), removehook ( self, hook ) :
+        hook ( phase, key, seconds ) is called after every add(), which
+        is the place to feed another metrics collector.
+        count ( self, phase, key = None ), seconds ( self, phase, key = None ) :
+        How many times, and for how long in all, phase has run, for all
+        options or just for key.
+        asdict ( self ) :
+        Returns { phase : { 'count' : n, 'seconds' : t, 'keys' : { key :
+        { 'count' : n, 'seconds' : t } } } }.
+        report ( self, n = 5 ) :
+        Returns a short table of the phases, slowest first, and the n
+        slowest function options and files.  This is also its __repr__.
+        reset ( self ) :
+        Forgets everything counted so far.
+        clock :
+        The timer, time.time by default; phasetimer ( clock ) uses
+        another.
+
+    The phases are "setargs" (building the options, once per setargs()),
+    "match" (finding which option a long option word means), "convert"
+    (checking and converting an option's value), "callback" (running a
+    function option's function) and "open" (opening a file in open()).
 
     METHODS
     The methods provided by the arguments class are:
 
-        __init__ ( self, c = '-', a = ( ) ) : where
+        __init__ ( self, c = '-', a = ( ), prof = None ) : where
         c = switch character for options.
         a = an arglist as defined above.
+        prof = if given, passed to setprofiler() before the arglist is
+        read, so that setargs() is timed too.
         __del__ ( self ) :
         closes any open files.
+        __enter__ ( self ), __exit__ ( self, ... ) :
+        Make an arguments instance usable in a with statement, which
+        closes any open files on the way out.
         __repr__ ( self ) :
         Returns a string that can be used to display short
-        help to the user.
+        help to the user.  The string is built once and kept until the
+        options, or the switch or paren character, change.
         options ( self ) :
         Returns a string of option letters or option words, suitably
-        separated if need be, for use in a "Usage" message.
+        separated if need be, for use in a "Usage" message.  Option words
+        are separated by the list separator, or by a space if that hasn't
+        been set.  Kept, like the __repr__ string.
+        toString ( self ) :
+        Returns a string listing each option with its current value, one
+        to a line.  Kept until setvalue() changes a value.
         argtype ( self, let ) :
         Returns a string representing the argument type expected
         by the option.  This can be one of:
             "#" for integers and longs;
             "#.#" for floats;
             "<file>" for filenames for file options;
-            "<list>" for lists and tuples;
+            "<list>" for lists and tuples, lazy or not;
+            "<#...>" and "<#.#...>" for intarray and floatarray;
             "" for everything else.
         This method is used in __repr__.
         has_key ( self, let ) :
@@ -170,6 +498,30 @@ ARGLIST FIELDS
             v     = default value;
             mode  = second argument to open().
         Used internally; you shouldn't ordinarily need to use this.
+        invalidate ( self ) :
+        Throws away everything derived from the set of options: the
+        prefix index used by matchlongarg() and the remembered results
+        of keys(), longest() and longestargtype().  additem() calls this;
+        call it yourself only if you change the args dictionary directly.
+        invalidatehelp ( self ) :
+        Throws away the strings kept by __repr__(), options() and
+        toString(); call it if you change an option's docstring or value
+        directly rather than through setvalue().
+        freeze ( self ) :
+        Builds everything that is otherwise worked out on first use (the
+        prefix index, keys(), longest() and longestargtype()) and marks
+        the arguments instance as frozen; returns the instance.  From
+        then on additem(), setargs(), setvalue() and the setswitch()
+        family raise TypeError, so nothing about the instance can change
+        and any number of threads may call parse() or parsemany(), or
+        getargs() with a parseresult, on it at the same time.  Counters
+        (0j options) then count per parseresult, not across parses.
+        checkfrozen ( self ) :
+        Raises TypeError if freeze() has been called.  Used internally.
+        compile ( self, let ) :
+        Returns the ( converter, handler ) pair getargs() uses for the
+        option let, or None if there is no such option.  The pair is
+        looked up in the addtype() table when the option is added.
         type ( self, let ) :
         Returns either the type of option ("<type 'dictionary'>", etc.)
         or None if there is no such option.
@@ -185,26 +537,90 @@ ARGLIST FIELDS
         the file pointer is either None, in which case the open()
         method needs to be called, or an already open file pointer
         which may be used directly.
-        open ( self, let ) :
+        open ( self, let, prefetch = 0 ) :
         If this is a file option and the option exists, performs an open()
         on the filename using the stored mode.  Returns None if the option
-        doesn't exist or if open() returns None.
+        doesn't exist or if open() returns None.  The file is opened the
+        first time open() is called for it; later calls return the same
+        file pointer.  No more than maxfiles() files are kept open at
+        once: opening one more closes the one least recently returned by
+        open(), and reopens it, at the same position, the next time it
+        is asked for.  Files opened for writing are reopened without
+        being truncated.  (Positions are taken with tell(), so a file
+        read by iterating over it should not be evicted; raise the limit
+        with setmaxfiles() instead.)  "stdin", "stdout" and "stderr" are
+        never counted or closed.
+
+        If the option's mode is "m", open() returns a read-only mmap of
+        the file, which can be sliced, searched with find() and passed
+        to buffer() without copying the data.  If the file can't be
+        mapped (it is empty, a pipe or a device) it is opened with mode
+        "rb" instead; "stdin" is returned as sys.stdin as usual.  Both
+        have read(), readline(), seek(), tell() and close().
+
+        Given prefetch, the first prefetch bytes of a file opened for
+        reading are read ahead into the system's cache; see openall().
+        openall ( self, lets = None, prefetch = 0, workers = 8 ) :
+        Opens the file options in the list lets (by default, every file
+        option that has a value) at the same time, on a pool of up to
+        workers threads, and returns a dictionary of their file pointers
+        by key.  This is open() for each of them, so the standard streams
+        are returned as they are, files are kept and counted as usual,
+        and later open() calls return the same file pointers; but when
+        the files are on slow disks or network mounts, the waits overlap
+        instead of adding up.  Only the first maxfiles() options are
+        opened.  prefetch is passed on to open(): reading the first block
+        of each file as it is opened gets that wait over with too.  If
+        any file can't be opened, the first such error is raised once
+        all the others have been tried.
+        aopen ( self, let, prefetch = 0 ) :
+        Starts open ( let, prefetch ) on one of the threads of
+        threadpool() and returns at once, with the AsyncResult of the
+        call: its get() method waits for and returns the file pointer,
+        or raises the error.  (Python 2 has no asyncio; an AsyncResult
+        is the nearest thing to a future.)
+        uselock ( self ) :
+        Makes open(), close() and the files they keep safe to use from
+        several threads at once, by giving the instance a lock; openall()
+        and aopen() call this.  A pickled instance has no lock.  Used
+        internally.
         close ( self, let ) :
-        If this is a valid option and the file pointer is open, fflushes it
-        and closes it.  There is no return value.  Automatically called
-        by the __del__ method, so you don't always need to do this.
+        If this is a valid option and the file pointer is open, flushes it
+        and closes it.  There is no return value.  A later open() starts
+        afresh.
+        closeall ( self ) :
+        Closes every file opened through open().  Called by __exit__(),
+        so the simplest way to be sure files get closed is
+
+            with arguments ( '-', arglist ) as xarg:
+                progname, sys.argv = xarg.getargs ( sys.argv )
+                ...
+
+        __del__ calls it too, but when that happens is up to Python.
+        maxfiles ( self ) :
+        Returns the number of files open() keeps open at once, 64 by
+        default.
+        setmaxfiles ( self, n ) :
+        Sets that number to n, closing files if need be; 0 or None means
+        no limit.
+        evict ( self, let ) :
+        Closes the file of option let, remembering its position for the
+        next open().  Used internally.
         docstring ( self, let ) :
         Returns the docstring, if there is one and if let is a valid option.
         len ( self ) :
         Returns the number of options currently defined.
         keys ( self ) :
         Returns a _sorted_ list of the options.  If there are no options
-        currently defined, returns None.
+        currently defined, returns None.  The sorted list is remembered
+        until the next additem(); each call returns a fresh copy of it.
         longest ( self ) :
         Returns 0 or the len() of the longest option string.
         longestargtype ( self ) :
         Returns 0 or the len() of the longest argtype string used by the
-        current set of options.
+        current set of options.  Like keys(), longest() and
+        longestargtype() are worked out once and remembered until the
+        next additem().
         switchchar ( self ) :
         Returns the switch character, which is '-' by default.
         setswitch ( self, let ) :
@@ -233,11 +649,37 @@ ARGLIST FIELDS
         seteq ( self, c ) :
         Sets the long option value separator character to c; it's not a good
         idea to set this to ' '.
+        respchar ( self ) :
+        Returns the character that marks a response file, which is None
+        (no response files) by default.
+        setresp ( self, c ) :
+        Sets the response file character to c, usually '@'; see RESPONSE
+        FILES above.
+        profiler ( self ) :
+        Returns the phasetimer counting this instance's work, or None if
+        profiling is off, as it is by default.  Profiling off costs one
+        test per option parsed.
+        setprofiler ( self, p = 1 ) :
+        Turns profiling on with p, a phasetimer (which several instances
+        may share) or any other true value for a new one, or off with
+        None or 0.  Returns the phasetimer, or None.  A pickled instance
+        comes back with profiling off.
         setvalue ( self, c, v ) :
         If c is a valid option, this method checks the type of v with the
         required type of c.  The value indicated by v may not be None.
-        Attempting to set an improper value prints an error message and
-        otherwise does nothing.
+        Attempting to set an improper value reports it as getargs()
+        reports errors, raising argerror in "raise" mode, and otherwise
+        does nothing.
+        callfunc ( self, let ) :
+        Calls the function stored as the value of option let, passing it
+        let; this is what getargs() does when it finds a function option.
+        parseresult has the same method, so a subclass of it can record
+        or veto such calls instead of making them.
+        coerce ( self, c, t, v, old ) :
+        The checking half of setvalue(): given the option key c, its
+        record t, the proposed value v and the value old it would replace,
+        returns ( 1, value to store ) or ( 0, argerror ).  Used
+        internally.
         setargs ( self, list ) :
         If list is a list of the form ( ( let, type, docstring, ... ), ... ),
         then setargs() runs through the outer list and uses the elements of the
@@ -249,10 +691,14 @@ ARGLIST FIELDS
         all characters have to match exactly.  If m is 'long', for example,
         and there are options 'l', 'lo' and 'longest', then matchlongarg()
         will return 'longest' as its best choice.  The return value can
-        then be used as an option key in, say, setvalue().
-        getargs ( self, argv ) :
+        then be used as an option key in, say, setvalue().  The search
+        runs over a prefix index of the option keys, built the first time
+        it is needed (or by freeze()) and again after any additem(), so it
+        costs about the length of m no matter how many options there are.
+        Programs whose options are all single letters never build it.
+        getargs ( self, argv, res = None ) :
         This is the interface between the option list (well, actually a
-        dictionary of dictionaries) and the program's command line.
+        dictionary of option records) and the program's command line.
         The proper way to use this method is (for example):
 
             xarg = arguments ( '-', arglist )
@@ -262,7 +708,107 @@ ARGLIST FIELDS
         and the first non-option argument will be consumed, leaving
         the program responsible for any remaining command-line
         parameters.  Values of any of the options may be obtained
-        through the value() method.
+        through the value() method.  argv is read once, front to back,
+        and is not copied until the remaining parameters are sliced off;
+        a value that is missing or of the wrong type is reported (see
+        ERRORS above) and the token that was offered for it is left in
+        place.
+
+        If res, a parseresult instance, is given, the values found are
+        stored in res instead of in the arguments instance, and res.progname
+        and res.argv are set to the two values returned.
+        parse ( self, argv, errmode = None ) :
+        Parses argv just as getargs() does, but leaves the values held by
+        the arguments instance alone: whatever the command line sets goes
+        into a new parseresult instance, which is returned.  Its value()
+        method (or subscript) works like the one of class arguments and
+        falls back to the arglist defaults; its progname and argv
+        attributes hold what getargs() would have returned.  One
+        arguments instance can therefore parse any number of command
+        lines; functions in the arglist are still called as they are
+        found.  For use from several threads at once, see freeze().
+        Its errors attribute lists what was wrong with argv, which is
+        handled as errmode, or if that is None as errormode(), says.
+        parsemany ( self, argvs, errmode = None ) :
+        A generator that runs parse() over each argv in the sequence or
+        iterator argvs and yields the parseresult instances in order.
+        The arglist is compiled once, when the arguments instance is
+        built, rather than once per command line.
+        iterparse ( self, argv, errors = None ) :
+        A generator that parses argv a token at a time, the way getargs()
+        does, and yields ( key, value ) for each option as it is found.
+        value is the converted value for options that take one, 1 for
+        booleans and counters, and the function itself for function
+        options, which iterparse() does not call.  Nothing is stored.
+        The last pair yielded is ( None, remainder ), where remainder is
+        what getargs() would have returned as the new argv; argv[ 0 ] is
+        skipped over as the program name.  You can stop iterating at any
+        point, say on finding a help option, and the rest of argv is
+        left unread.  What is wrong with argv is added to the list errors,
+        if that is given, and otherwise kept in the errors attribute as
+        getargs() keeps it, except on a frozen instance, which several
+        threads may be parsing with at once: then give errors to see them.
+        scan ( self, argv, target ) :
+        The parser behind getargs() and parse(): runs over the options
+        iterparse() would yield and applies each to target, by
+        target.setvalue() or, for function options, target.callfunc().
+        Used internally.
+        events ( self, argv, errors = None, mode = "print" ) :
+        The generator behind iterparse(), which also yields each
+        option's record, and hands each complaint to fail() with errors
+        and mode.  Used internally, with nextvalue(), respfile() and
+        convert().
+        errormode ( self ) :
+        Returns the error mode, "print", "collect" or "raise"; see ERRORS
+        above.
+        seterrormode ( self, m ) :
+        Sets the error mode to m.
+        envvar ( self, let ) :
+        Returns the name of the environment variable getsources() reads
+        option let from, or None.
+        setenvvar ( self, let, name ) :
+        Makes getsources() read option let from the environment variable
+        name; None stops it.
+        getsources ( self, argv, fname = None, environ = None, res = None,
+        section = None ) :
+        Does what getargs() does, and returns the same, but also sets
+        options from the config file fname, if that is given, and from
+        environ (os.environ by default); see ENVIRONMENT AND CONFIG FILES
+        above.  section names the one INI section (or JSON member) to
+        read; by default all of an INI file is read, in order.  Keys in
+        fname that aren't options, values that don't convert and a file
+        that can't be read are reported as for the command line.  The
+        file is parsed by readconfig(), so reading it again costs almost
+        nothing until it changes.
+        sourcevalue ( self, t, v ) :
+        Converts v, a value from a config file or the environment, for
+        the option with record t.  Used internally.
+        update ( self, fragment, res = None ) :
+        Applies fragment, a list of options and values such as
+        [ '-verbose', '-threads', '32' ] with no program name in front,
+        on top of the values already set, in the arguments instance or,
+        if res is given, in that parseresult.  Only the options in
+        fragment are converted and checked, and function options are
+        called as they are by getargs().  Returns the keys whose values
+        changed, in the order they first appear in fragment; then the
+        watchers of each of them are called.  Errors are handled as for
+        getargs(), with positions counted as if a program name came
+        first; words left over after the options are errors too.  In
+        "raise" mode, a fragment with any error changes nothing.
+        parseresult.update ( fragment ) does the same for that
+        parseresult.
+        watch ( self, let, func ) :
+        Makes update() call func ( let, old, new ) when it changes the
+        value of option let; there can be any number of watchers for a
+        key.  Counters pass their counts, as value() returns them.
+        parseresult has watch() and unwatch() too, for its own values.
+        unwatch ( self, let, func = None ) :
+        Stops func, or all the watchers of let if func is None, being
+        called.
+        fail ( self, e, errors, mode, now = 0 ) :
+        Adds the argerror e to the list errors (unless that is None),
+        then prints it if mode is "print", or raises it if mode is
+        "raise" and now is true.  Used internally.
 
     HISTORICAL NOTE
     I first built a version of getargs() in C many years ago, but
@@ -310,9 +856,6 @@ ARGLIST FIELDS
 #
 
 import sys
-import os
-import time
-import math
 import string
 
 # Boolean       done        None
@@ -326,16 +869,82 @@ import string
 
 VERSION = "Version 1.3,  12.19.6.11.6  13 Kimi  14 Yax  G1  11:11:01"
 
-try:
-    nofile = open("nul", "r")
-except IOError:
-    try:
-        nofile = open("/dev/null", "r")
-    except IOError:
-        nofile = sys.stdin
 
-if not nofile:
-    nofile = sys.stdin
+class filetype(object):
+    # The type of nofile.  Pickles by name, so that unpickling gives back
+    # this module's nofile.
+    __slots__ = ()
+
+    def __repr__(self):
+        return "nofile"
+
+    def __reduce__(self):
+        return "nofile"
+
+
+nofile = filetype()
+
+
+class arraytype(object):
+    # The types of intarray and floatarray, the values that declare options
+    # taking a NumPy array; dtype is what the array holds.  Like nofile,
+    # they pickle by name.
+    __slots__ = ()
+    name = "arraytype"
+    dtype = None
+
+    def __repr__(self):
+        return self.name
+
+    def __reduce__(self):
+        return self.name
+
+
+class intarraytype(arraytype):
+    __slots__ = ()
+    name = "intarray"
+    dtype = "int"
+
+
+class floatarraytype(arraytype):
+    __slots__ = ()
+    name = "floatarray"
+    dtype = "float"
+
+
+intarray = intarraytype()
+floatarray = floatarraytype()
+
+
+class lazytype(object):
+    # The types of lazylist and lazytuple, the values that declare list
+    # and tuple options whose values are split only as they are used;
+    # kind is the type of value they stand in for.  They pickle by name.
+    __slots__ = ()
+    name = "lazytype"
+    kind = None
+
+    def __repr__(self):
+        return self.name
+
+    def __reduce__(self):
+        return self.name
+
+
+class lazylisttype(lazytype):
+    __slots__ = ()
+    name = "lazylist"
+    kind = type([])
+
+
+class lazytupletype(lazytype):
+    __slots__ = ()
+    name = "lazytuple"
+    kind = type(())
+
+
+lazylist = lazylisttype()
+lazytuple = lazytupletype()
 
 
 def nofunc():
@@ -343,34 +952,1095 @@ def nofunc():
 
 
 def isnumber(s):
-    for c in s:
-        if c in string.digits or c in "-+":
-            pass
-        else:
-            return 0
+    try:
+        convint(s, None)
+    except ValueError:
+        return 0
     return 1
 
 
 def islong(s):
-    for c in s:
-        if c in string.digits or c in "-+" or c in "L":
-            pass
-        else:
-            return 0
+    try:
+        convlong(s, None)
+    except ValueError:
+        return 0
     return 1
 
 
 def isfloat(s):
-    for c in s:
-        if c in string.digits or c in "-+.eE":
+    try:
+        convfloat(s, None)
+    except ValueError:
+        return 0
+    return 1
+
+
+#
+# Value conversion.  Each converter takes the string found on the command
+# line and the list separator, and returns the value to store or raises
+# ValueError.  The numeric ones let int(), long() and float() do the
+# checking as they convert, having first looked at the ends of the string
+# to turn away the white space and words (such as "inf") those allow.
+#
+def convint(s, sep):
+    d = string.digits
+    try:
+        if s[-1] in d and (s[0] in d or s[0] in "+-" and s[1] in d):
+            v = int(s)
+            if type(v) == type(0):
+                return v  # Not too big for an int, when int() gives a long. ...
+    except IndexError:
+        pass
+    raise ValueError(s)
+
+
+def convlong(s, sep):
+    d = string.digits
+    try:
+        if (s[-1] in d or s[-1] == "L") and (s[0] in d or s[0] in "+-" and s[1] in d):
+            return long(s)
+    except IndexError:
+        pass
+    raise ValueError(s)
+
+
+def convfloat(s, sep):
+    d = string.digits
+    try:
+        if (s[-1] in d or s[-1] == ".") and (s[0] in d or s[0] in "+-." and s[1] in d or s[0] in "+-" and s[1] == "."):
+            return float(s)
+    except IndexError:
+        pass
+    raise ValueError(s)
+
+
+def convstr(s, sep):
+    return s
+
+
+def convlist(s, sep):
+    return string.splitfields(s, sep)
+
+
+def convtuple(s, sep):
+    return tuple(string.splitfields(s, sep))
+
+
+def convlazylist(s, sep):
+    return splitseq(s, sep, type([]))
+
+
+def convlazytuple(s, sep):
+    return splitseq(s, sep, type(()))
+
+
+def listkind(t):
+    # The type of value, type([]) or type(()), the option with record t
+    # holds, or None if it isn't a list or tuple option.
+    if t.kind == type([]) or t.kind == type(()):
+        return t.kind
+    if isinstance(t.type, lazytype):
+        return t.type.kind
+    return None
+
+
+def convarray(s, sep, dtype, conv):
+    # Parses all of s in one call to numpy.fromstring(), which is only
+    # imported here.  fromstring() stops quietly at the first thing it
+    # can't read, so the count is checked against the number of words;
+    # that leaves junk at the end of the last word, which conv checks.
+    import warnings
+    import numpy
+
+    if sep == None:
+        words = s.split()
+        n = len(words)
+        last = words and words[-1] or ""
+        sep = " "  # Any amount of white space, to fromstring(). ...
+    else:
+        n = s.count(sep) + 1
+        last = string.strip(s[string.rfind(s, sep) + len(sep) :])
+        if n == 1:
+            last = string.strip(s)
+    conv(last, None)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            a = numpy.fromstring(s, dtype, sep=sep)
+    except (ValueError, Warning):
+        raise ValueError(s)
+    if len(a) != n:
+        raise ValueError(s)
+    return a
+
+
+def checkarray(v, dtype):
+    # The array setvalue() stores for v, a sequence of numbers, in an
+    # option holding dtype, or None.  Nothing is converted that would lose
+    # anything (floats to ints), or that isn't a number to begin with
+    # (strings), and float arrays are finite, as on the command line.
+    import numpy
+
+    try:
+        a = numpy.asarray(v)
+    except (ValueError, TypeError):
+        return None
+    if a.ndim != 1:
+        return None
+    if len(a) == 0:
+        return a.astype(dtype)
+    if a.dtype.kind not in "iuf" or not numpy.can_cast(a.dtype, dtype, "same_kind"):
+        return None
+    a = a.astype(dtype, copy=False)
+    if a.dtype.kind == "f" and not numpy.isfinite(a).all():
+        return None
+    return a
+
+
+def convintarray(s, sep):
+    return convarray(s, sep, intarray.dtype, convint)
+
+
+def convfloatarray(s, sep):
+    # fromstring() also reads nan, inf and infinity, which convfloat()
+    # turns away, anywhere in s; so every element is checked.
+    import numpy
+
+    a = convarray(s, sep, floatarray.dtype, convfloat)
+    if not numpy.isfinite(a).all():
+        raise ValueError(s)
+    return a
+
+
+#
+# Options that take no value have a flag function instead, which is given
+# the option record and key and whether the option was given as a long
+# option, and returns the value of the option (None to ignore it) or
+# raises ValueError.  Either way, what the parser finds is passed on by
+# an apply function to the object being filled in, an arguments or a
+# parseresult instance.
+#
+def flagbool(t, let, longopt):
+    return 1
+
+
+def flagcount(t, let, longopt):
+    if longopt:
+        raise ValueError("Long argument can't do autoincrementing")
+    return 1
+
+
+def flagfunc(t, let, longopt):
+    return t.value
+
+
+def flagskip(t, let, longopt):
+    return None
+
+
+def storevalue(xarg, let, v):
+    xarg.setvalue(let, v)
+
+
+def callvalue(xarg, let, v):
+    xarg.callfunc(let)
+
+
+class valuetype:
+    def __init__(self, hint, conv=None, flag=flagskip, apply=storevalue):
+        self.hint = hint
+        self.conv = conv
+        self.flag = flag
+        self.apply = apply
+
+
+valuetypes = {}
+
+
+def addtype(typ, hint, conv=None, flag=flagskip, apply=storevalue):
+    valuetypes[type(typ)] = valuetype(hint, conv, flag, apply)
+
+
+addtype(None, "", None, flagbool)
+addtype(0j, "*", None, flagcount)
+addtype(nofunc, "", None, flagfunc, callvalue)
+addtype(0, "#", convint)
+addtype(0L, "#", convlong)
+addtype(0.0, "#.#", convfloat)
+addtype("", "", convstr)
+addtype(nofile, "<file>", convstr)
+addtype([], "<list>", convlist)
+addtype((), "<list>", convtuple)
+addtype(lazylist, "<list>", convlazylist)
+addtype(lazytuple, "<list>", convlazytuple)
+addtype(intarray, "<#...>", convintarray)
+addtype(floatarray, "<#.#...>", convfloatarray)
+
+
+def mapfile(fname):
+    # Maps a regular, non-empty file read-only; anything else (a pipe, a
+    # device, an empty file) comes back as a plain file opened "rb".
+    import os
+    import mmap
+    import stat
+
+    fp = open(fname, "rb")
+    try:
+        st = os.fstat(fp.fileno())
+        if not stat.S_ISREG(st.st_mode) or st.st_size < 1:
+            return fp
+        m = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        return fp
+    fp.close()
+    return m
+
+
+def openfile(fname, mode, offset=None, prefetch=0):
+    # Opens fname for open(): mode "m" maps it, anything else goes to the
+    # built-in open().  A file being reopened goes back to offset.  With
+    # prefetch, up to that many bytes of a file opened for reading are
+    # read and thrown away, so that the first real read finds them in
+    # the system's cache.
+    if mode == "m":
+        fp = mapfile(fname)
+    else:
+        fp = open(fname, mode)
+    if offset != None and mode[:1] != "a":
+        fp.seek(offset)
+    if prefetch and (mode == "m" or mode[:1] == "r"):
+        pos = fp.tell()
+        fp.read(prefetch)
+        fp.seek(pos)
+    return fp
+
+
+iopool = None
+
+
+def threadpool():
+    # The pool of threads aopen() opens files on, started on first use.
+    global iopool
+    if iopool == None:
+        from multiprocessing.pool import ThreadPool
+
+        iopool = ThreadPool(8)
+    return iopool
+
+
+#
+# Change callbacks for update(), kept in a dictionary of lists by key.
+#
+def addwatcher(watchers, let, func):
+    watchers[let] = watchers.get(let, []) + [func]
+
+
+def dropwatcher(watchers, let, func=None):
+    funcs = [f for f in watchers.get(let, []) if func != None and f != func]
+    if funcs:
+        watchers[let] = funcs
+    elif watchers.has_key(let):
+        del watchers[let]
+
+
+def samevalue(a, b):
+    # Whether update() should count a value changing from a to b as no
+    # change; NumPy arrays compare element by element, so are asked.
+    if hasattr(a, "ndim") or hasattr(b, "ndim"):
+        import numpy
+
+        return numpy.array_equal(a, b)
+    return not (a != b)
+
+
+#
+# Config files for getsources().  readconfig() keeps what it has parsed in
+# configcache, by absolute file name and section, with the modification
+# time and size it was parsed at, and optionally in a marshal file checked
+# the same way, so that a file is parsed again only when it changes.
+#
+configmagic = "getargs config 1"
+configcache = {}
+
+
+def readconfig(fname, section=None, cachefile=None):
+    import os
+    import marshal
+
+    st = os.stat(fname)
+    stamp = (os.path.abspath(fname), st.st_mtime, st.st_size, section)
+    key = (stamp[0], section)
+    hit = configcache.get(key)
+    if hit != None and hit[0] == stamp:
+        return hit[1]
+    conf = None
+    if cachefile:
+        try:
+            fp = open(cachefile, "rb")
+            try:
+                magic, s, d = marshal.loads(fp.read())
+            finally:
+                fp.close()
+            if magic == configmagic and s == stamp:
+                conf = d
+        except (EnvironmentError, ValueError, EOFError, TypeError):
             pass
+    if conf == None:
+        conf = parseconfig(fname, section)
+        if cachefile:
+            writefile(cachefile, marshal.dumps((configmagic, stamp, conf)))
+    configcache[key] = (stamp, conf)
+    return conf
+
+
+def parseconfig(fname, section=None):
+    fp = open(fname, "rb")
+    try:
+        if string.lower(fname[-5:]) == ".json":
+            import json
+
+            d = json.load(fp)
+            if section != None and type(d) == type({}):
+                d = d.get(section)
+            if type(d) != type({}):
+                raise ValueError("no JSON object")
+            conf = {}
+            for k, v in d.items():
+                if type(k) == type(u""):
+                    k = k.encode("utf-8")
+                conf[k] = v
+            return conf
+        import ConfigParser
+
+        p = ConfigParser.RawConfigParser()
+        p.optionxform = str  # Option keys are case sensitive. ...
+        try:
+            p.readfp(fp, fname)
+        except ConfigParser.Error, e:
+            raise ValueError(string.strip(str(e)))
+    finally:
+        fp.close()
+    if section != None:
+        sections = [section]
+    else:
+        sections = p.sections()
+    conf = {}
+    for s in sections:
+        if p.has_section(s):
+            for k, v in p.items(s):
+                conf[k] = v
+    return conf
+
+
+def readtokens(fp, sep):
+    # Yields the words of the open response file fp, read a block at a
+    # time.  Words are separated by NULs if the first block holds one,
+    # and otherwise by sep and line ends (by any white space if sep is
+    # None); empty words are skipped.  fp is closed at the end.
+    try:
+        delim = 0
+        tail = ""
+        while 1:
+            buf = fp.read(65536)
+            if not buf:
+                break
+            if delim == 0:
+                if string.find(buf, "\0") >= 0:
+                    delim = "\0"
+                else:
+                    delim = sep
+            buf = tail + buf
+            if delim == None:
+                words = string.split(buf)
+                tail = ""
+                if words and buf[-1:] not in string.whitespace:
+                    tail = words.pop()
+            else:
+                if delim != "\0":
+                    buf = string.replace(string.replace(buf, "\r", delim), "\n", delim)
+                words = string.split(buf, delim)
+                tail = words.pop()
+            for w in words:
+                if w:
+                    yield w
+        if tail:
+            yield tail
+    finally:
+        fp.close()
+
+
+class lazyseq(object):
+    # Base class for list and tuple option values whose elements are only
+    # worked out when they are asked for.  Subclasses provide iterate(),
+    # and faster length(), lookup() and part() if they can; kind is the
+    # type they stand in for, type([]) or type(()).  A list value that is
+    # changed in place becomes an ordinary list first, kept in items.
+    kind = type([])
+    items = None
+
+    def iterate(self):
+        return iter(())
+
+    def length(self):
+        n = 0
+        for x in self.iterate():
+            n = n + 1
+        return n
+
+    def lookup(self, i):
+        for x in self.iterate():
+            if i == 0:
+                return x
+            i = i - 1
+        raise IndexError("%s index out of range" % (self.kind.__name__))
+
+    def part(self, start, stop, step):
+        import itertools
+
+        if step < 0:
+            items = list(self.iterate())
+            return self.kind([items[k] for k in xrange(start, stop, step)])
+        return self.kind(itertools.islice(self.iterate(), start, stop, step))
+
+    def __iter__(self):
+        if self.items != None:
+            return iter(self.items)
+        return self.iterate()
+
+    def __len__(self):
+        if self.items != None:
+            return len(self.items)
+        return self.length()
+
+    def item(self, i):
+        if self.items != None:
+            return self.items[i]
+        if i < 0:
+            i = i + len(self)
+            if i < 0:
+                raise IndexError("%s index out of range" % (self.kind.__name__))
+        return self.lookup(i)
+
+    def __getitem__(self, i):
+        if type(i) != type(slice(0)):
+            return self.item(i)
+        if self.items != None:
+            return self.items[i]
+        if (i.start or 0) >= 0 and (i.stop or 0) >= 0 and (i.step or 1) > 0:
+            start, stop, step = i.start or 0, i.stop, i.step or 1
+            if stop == None:
+                stop = len(self)
         else:
-            return 0
-    return 1
+            start, stop, step = i.indices(len(self))
+        return self.part(start, stop, step)
+
+    def __contains__(self, x):
+        for y in self:
+            if y == x:
+                return 1
+        return 0
+
+    def index(self, x, start=0, stop=None):
+        if start < 0 or stop != None and stop < 0:
+            if stop == None:
+                return self.kind(self).index(x, start)  # Counts from the end. ...
+            return self.kind(self).index(x, start, stop)
+        n = 0
+        for y in self:
+            if stop != None and n >= stop:
+                break
+            if n >= start and y == x:
+                return n
+            n = n + 1
+        raise ValueError("%r is not in %s" % (x, self.kind.__name__))
+
+    def count(self, x):
+        n = 0
+        for y in self:
+            if y == x:
+                n = n + 1
+        return n
+
+    def __eq__(self, other):
+        if isinstance(other, lazyseq):
+            if other.kind != self.kind:
+                return False
+        elif type(other) != self.kind:
+            return NotImplemented
+        return self.kind(self) == self.kind(other)
+
+    def __ne__(self, other):
+        r = self.__eq__(other)
+        if r is NotImplemented:
+            return r
+        return not r
+
+    # Ordering is that of the list or tuple, against anything.
+    def __lt__(self, other):
+        if isinstance(other, lazyseq):
+            other = other.kind(other)
+        return self.kind(self) < other
+
+    def __le__(self, other):
+        if isinstance(other, lazyseq):
+            other = other.kind(other)
+        return self.kind(self) <= other
+
+    def __gt__(self, other):
+        if isinstance(other, lazyseq):
+            other = other.kind(other)
+        return self.kind(self) > other
+
+    def __ge__(self, other):
+        if isinstance(other, lazyseq):
+            other = other.kind(other)
+        return self.kind(self) >= other
+
+    def __hash__(self):
+        if self.kind != type(()):
+            raise TypeError("unhashable type: '%s'" % (self.kind.__name__))
+        return hash(tuple(self))
+
+    def __add__(self, other):
+        return self.kind(self) + other
+
+    def __radd__(self, other):
+        return other + self.kind(self)
+
+    def __mul__(self, n):
+        return self.kind(self) * n
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return repr(self.kind(self))
+
+    # The list methods that change the value in place.
+    def mutable(self):
+        if self.kind != type([]):
+            raise TypeError("'%s' object is immutable" % (self.kind.__name__))
+        if self.items == None:
+            self.items = list(self.iterate())
+        return self.items
+
+    def __setitem__(self, i, x):
+        self.mutable()[i] = x
+
+    def __delitem__(self, i):
+        del self.mutable()[i]
+
+    def __iadd__(self, other):
+        if self.kind == type(()):
+            return self.kind(self) + tuple(other)  # A new tuple, as for a real one. ...
+        self.mutable().extend(other)
+        return self
+
+    def append(self, x):
+        self.mutable().append(x)
+
+    def extend(self, other):
+        self.mutable().extend(other)
+
+    def insert(self, i, x):
+        self.mutable().insert(i, x)
+
+    def remove(self, x):
+        self.mutable().remove(x)
+
+    def pop(self, i=-1):
+        return self.mutable().pop(i)
+
+    def reverse(self):
+        self.mutable().reverse()
+
+    def sort(self, *args, **kwargs):
+        self.mutable().sort(*args, **kwargs)
+
+
+class splitseq(lazyseq):
+    # The value of a list or tuple option as given on the command line:
+    # the words of s, split on sep (or on runs of white space if sep is
+    # None) as string.splitfields() would, but cut out of s only as they
+    # are asked for.  The first index past the first few (or len(), if
+    # sep is None) notes where each word starts and ends in two arrays;
+    # nothing else is copied.
+    def __init__(self, s, sep, kind):
+        if sep == "":
+            raise ValueError("empty separator")
+        self.s = s
+        self.sep = sep
+        self.kind = kind
+        self.starts = None
+        self.ends = None
+
+    def iterate(self):
+        s = self.s
+        sep = self.sep
+        if sep == None:
+            import re
+
+            for m in re.finditer(r"\S+", s):
+                yield m.group()
+            return
+        i = 0
+        w = len(sep)
+        while 1:
+            j = s.find(sep, i)
+            if j < 0:
+                yield s[i:]
+                return
+            yield s[i:j]
+            i = j + w
+
+    def build(self):
+        import array
+
+        s = self.s
+        sep = self.sep
+        starts = array.array("l")
+        ends = array.array("l")
+        if sep == None:
+            import re
+
+            for m in re.finditer(r"\S+", s):
+                starts.append(m.start())
+                ends.append(m.end())
+        else:
+            i = 0
+            w = len(sep)
+            j = s.find(sep)
+            while j >= 0:
+                starts.append(i)
+                ends.append(j)
+                i = j + w
+                j = s.find(sep, i)
+            starts.append(i)
+            ends.append(len(s))
+        self.starts = starts
+        self.ends = ends
+
+    def length(self):
+        if self.starts == None:
+            if self.sep != None:
+                return self.s.count(self.sep) + 1
+            self.build()
+        return len(self.starts)
+
+    def lookup(self, i):
+        if self.starts == None:
+            if i < 16:
+                return lazyseq.lookup(self, i)
+            self.build()
+        if i >= len(self.starts):
+            raise IndexError("%s index out of range" % (self.kind.__name__))
+        return self.s[self.starts[i] : self.ends[i]]
+
+    def part(self, start, stop, step):
+        if self.starts == None:
+            self.build()
+        s = self.s
+        starts = self.starts
+        ends = self.ends
+        if step > 0:
+            stop = min(stop, len(starts))
+        return self.kind([s[starts[k] : ends[k]] for k in xrange(start, stop, step)])
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d["starts"] = d["ends"] = None
+        return d
+
+
+class respseq(lazyseq):
+    # The value of a list or tuple option given as @file: the words of
+    # the response file, read from it afresh each time they are iterated
+    # over, so the whole list is never held in memory.
+    def __init__(self, fname, sep, kind):
+        open(fname, "rb").close()
+        self.fname = fname
+        self.sep = sep
+        self.kind = kind
+        self.n = None
+
+    def iterate(self):
+        return readtokens(open(self.fname, "rb"), self.sep)
+
+    def length(self):
+        if self.n == None:
+            self.n = lazyseq.length(self)
+        return self.n
+
+
+class argerror(ValueError):
+    # One thing wrong with a command line: what went wrong (one of
+    # "unlisted", "missing", "flag", "type", "respfile", or "exception"
+    # for anything else), the position in argv of the token at fault (for
+    # a word from a response file, of the @file that brought it in), the
+    # option key, the type that was expected and the offending token or
+    # value.  str() gives the message getargs() prints for it.
+    def __init__(self, what, message, position=None, key=None, expected=None, token=None):
+        ValueError.__init__(self, message)
+        self.what = what
+        self.position = position
+        self.key = key
+        self.expected = expected
+        self.token = token
+
+    def __reduce__(self):
+        return (argerror, (self.what, str(self), self.position, self.key, self.expected, self.token))
+
+    def __repr__(self):
+        return "<argerror %s at %s: %s>" % (self.what, self.position, self)
+
+
+class argerrors(ValueError):
+    # Raised at the end of a parse in "raise" mode; errors is the list of
+    # argerror instances, one per complaint.
+    def __init__(self, errors):
+        ValueError.__init__(self, string.join(map(str, errors), "\n"))
+        self.errors = errors
+
+    def __reduce__(self):
+        return (argerrors, (self.errors,))
+
+
+class argstream:
+    # Hands the parser its tokens: those of argv, through the cursor n,
+    # and those of response files, which are read as they are needed.
+    # files is a stack of [ word generator, word peeked at, position ]
+    # lists, the innermost file last.  errors and mode are where the
+    # parser reports what goes wrong and how; see arguments.fail().
+    def __init__(self, argv, n, errors=None, mode="print"):
+        self.argv = argv
+        self.n = n
+        self.na = len(argv)
+        self.files = []
+        self.errors = errors
+        self.mode = mode
+
+    def peek(self):
+        if not self.files:
+            if self.n < self.na:
+                return self.argv[self.n]
+            return None
+        while self.files:
+            f = self.files[-1]
+            if f[1] != None:
+                return f[1]
+            try:
+                f[1] = f[0].next()
+                return f[1]
+            except StopIteration:
+                self.files.pop()
+        if self.n < self.na:
+            return self.argv[self.n]
+        return None
+
+    def take(self):
+        if self.files:
+            self.files[-1][1] = None
+        else:
+            self.n = self.n + 1
+
+    def expand(self, fname):
+        if len(self.files) >= 64:
+            raise ValueError("Response files nested too deeply")
+        fp = open(fname, "rb")
+        self.files.append([readtokens(fp, None), None, self.pos()])
+
+    def pos(self):
+        # Where in argv the token last taken came from.
+        if self.files:
+            return self.files[0][2]
+        return self.n - 1
+
+    def rest(self):
+        r = []
+        while self.files:
+            f = self.files.pop()
+            if f[1] != None:
+                r.append(f[1])
+            r.extend(f[0])
+        return r + self.argv[self.n :]
+
+
+class prefixindex:
+    # A character trie over the option keys.  Each node is a list of
+    # [ children, count, best ], where count is the number of keys at or
+    # below the node and best is the longest of them (the first in sorted
+    # order on ties), so that matchlongarg() never has to look at the keys
+    # themselves.
+    def __init__(self, keys=()):
+        self.root = [{}, 0, None]
+        for k in keys:
+            self.add(k)
+
+    def add(self, key):
+        node = self.root
+        self.note(node, key)
+        for c in key:
+            kids = node[0]
+            if kids.has_key(c):
+                node = kids[c]
+            else:
+                node = [{}, 0, None]
+                kids[c] = node
+            self.note(node, key)
+
+    def note(self, node, key):
+        node[1] = node[1] + 1
+        b = node[2]
+        if b == None or len(key) > len(b) or (len(key) == len(b) and key < b):
+            node[2] = key
+
+    def find(self, s):
+        node = self.root
+        for c in s:
+            node = node[0].get(c)
+            if node == None:
+                return None
+        if node[1] < 1:
+            return None
+        return node
+
+
+class option(object):
+    # One entry of an arguments instance.  The slots named in fields are
+    # also reachable by subscript, so that a record still reads and
+    # writes like the dictionary it replaces ( t["value"], t.has_key("fp") ).
+    # An unset slot, like fp before a file has been opened, behaves as a
+    # missing key.  kind, conv, flag and handler are compiled from the type
+    # through the addtype() table.
+    __slots__ = ("type", "docstring", "value", "mode", "fp", "offset", "kind", "conv", "flag", "handler")
+    fields = ("type", "docstring", "value", "mode", "fp")
+
+    def __init__(self, typ, str, v=None, mode="r"):
+        self.docstring = str
+        self.value = v
+        self.mode = mode
+        self.settype(typ)
+
+    def settype(self, typ):
+        if type(typ) == type(sys.stdin):
+            typ = nofile  # An old-style file option. ...
+        self.type = typ
+        self.kind = type(typ)
+        vt = valuetypes.get(self.kind)
+        if vt == None:
+            vt = valuetype("")
+        self.conv = vt.conv
+        self.flag = vt.flag
+        self.handler = vt.apply
+
+    def __getitem__(self, k):
+        if k in self.fields:
+            try:
+                return getattr(self, k)
+            except AttributeError:
+                pass
+        raise KeyError(k)
+
+    def __setitem__(self, k, v):
+        if k == "type":
+            self.settype(v)
+        elif k in self.fields:
+            setattr(self, k, v)
+        else:
+            raise KeyError(k)
+
+    def __delitem__(self, k):
+        if k not in self.fields:
+            raise KeyError(k)
+        try:
+            delattr(self, k)
+        except AttributeError:
+            raise KeyError(k)
+
+    def has_key(self, k):
+        return k in self.fields and hasattr(self, k)
+
+    __contains__ = has_key
+
+    def get(self, k, d=None):
+        if self.has_key(k):
+            return getattr(self, k)
+        return d
+
+    def keys(self):
+        return [k for k in self.fields if hasattr(self, k)]
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.keys()]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __getstate__(self):
+        # Open files are not carried over.
+        return (self.type, self.docstring, self.value, self.mode)
+
+    def __setstate__(self, state):
+        typ, self.docstring, self.value, self.mode = state
+        self.settype(typ)
+
+
+class parseresult(object):
+    # The outcome of one arguments.parse(): the values set by the command
+    # line, kept apart from the arguments instance (the spec) that
+    # describes the options, plus the program name and the remaining
+    # argv.  Options the command line did not mention read through to
+    # the spec's defaults.
+    __slots__ = ("spec", "values", "progname", "argv", "errors", "errmode", "watchers")
+
+    def __init__(self, spec, errmode=None):
+        self.spec = spec
+        self.values = {}
+        self.progname = None
+        self.argv = None
+        self.errors = []
+        self.errmode = errmode or spec.errmode
+        self.watchers = {}
+
+    def update(self, fragment):
+        return self.spec.update(fragment, self)
+
+    def watch(self, let, func):
+        addwatcher(self.watchers, let, func)
+
+    def unwatch(self, let, func=None):
+        dropwatcher(self.watchers, let, func)
+
+    def setvalue(self, c, v):
+        t = self.spec.args.get(c)
+        if t != None:
+            ok, v = self.spec.coerce(c, t, v, self.values.get(c, t.value))
+            if ok:
+                self.values[c] = v
+            else:
+                self.spec.fail(v, self.errors, self.errmode, 1)
+
+    def value(self, let):
+        if self.values.has_key(let):
+            v = self.values[let]
+        else:
+            t = self.spec.args.get(let)
+            if t == None:
+                return None
+            v = t.value
+        if type(v) == type(0j):
+            return int(abs(v))
+        return v
+
+    __getitem__ = value
+
+    def callfunc(self, let):
+        mfc = self.value(let)
+        if mfc:
+            prof = self.spec.prof
+            if prof:
+                t0 = prof.clock()
+            mfc(let)
+            if prof:
+                prof.add("callback", let, t0)
+
+    def type(self, let):
+        return self.spec.type(let)
+
+    def has_key(self, let):
+        return self.spec.has_key(let)
+
+    def keys(self):
+        return self.spec.keys()
+
+    def __repr__(self):
+        return "<parseresult %s %s %s>" % (self.progname, self.values, self.argv)
+
+
+class phasetimer:
+    # Counts and times what arguments instances spend in each phase of
+    # their work.  add() is given the phase, the option key (or None) and
+    # the clock() reading taken when the phase began; each hook is then
+    # called as hook ( phase, key, seconds ).
+    def __init__(self, clock=None):
+        if clock == None:
+            import time
+
+            clock = time.time
+        self.clock = clock
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.keys = {}
+
+    def add(self, phase, key, start):
+        t = self.clock() - start
+        s = self.phases.get(phase)
+        if s == None:
+            s = self.phases[phase] = [0, 0.0]
+        s[0] = s[0] + 1
+        s[1] = s[1] + t
+        if key != None:
+            s = self.keys.get((phase, key))
+            if s == None:
+                s = self.keys[(phase, key)] = [0, 0.0]
+            s[0] = s[0] + 1
+            s[1] = s[1] + t
+        for h in self.hooks:
+            h(phase, key, t)
+
+    def addhook(self, hook):
+        self.hooks.append(hook)
+
+    def removehook(self, hook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def count(self, phase, key=None):
+        if key == None:
+            s = self.phases.get(phase)
+        else:
+            s = self.keys.get((phase, key))
+        return s and s[0] or 0
+
+    def seconds(self, phase, key=None):
+        if key == None:
+            s = self.phases.get(phase)
+        else:
+            s = self.keys.get((phase, key))
+        return s and s[1] or 0.0
+
+    def asdict(self):
+        d = {}
+        for phase, s in self.phases.items():
+            d[phase] = {"count": s[0], "seconds": s[1], "keys": {}}
+        for (phase, key), s in self.keys.items():
+            d[phase]["keys"][key] = {"count": s[0], "seconds": s[1]}
+        return d
+
+    def report(self, n=5):
+        lines = ["%-10s %8s %12s %12s\n" % ("phase", "count", "total ms", "mean us")]
+        ph = self.phases.items()
+        ph.sort(lambda a, b: cmp(b[1][1], a[1][1]))
+        for phase, s in ph:
+            lines.append("%-10s %8d %12.3f %12.2f\n" % (phase, s[0], s[1] * 1e3, s[1] * 1e6 / s[0]))
+        for phase in ("callback", "open"):
+            k = [(s[1], key, s[0]) for (p, key), s in self.keys.items() if p == phase]
+            if k:
+                k.sort()
+                k.reverse()
+                lines.append("slowest %s:\n" % (phase))
+                for t, key, cnt in k[:n]:
+                    lines.append("    %-20s %8d %12.3f ms\n" % (key, cnt, t * 1e3))
+        return string.join(lines, "")
+
+    def __repr__(self):
+        return self.report()
 
 
 class arguments:
-    def __init__(self, c="-", a=()):
+    def __init__(self, c="-", a=(), prof=None):
 
         self.switch = c
         self.args = {}
@@ -378,216 +2048,369 @@ class arguments:
         self.sep = None
         self.argparen = ")"
         self.argeq = "="
+        self.resp = None
+        self.lindex = None
+        self.cache = {}
+        self.frozen = 0
+        self.openfiles = []
+        self.fmax = 64
+        self.prof = None
+        self.lock = None
+        self.errmode = "print"
+        self.errors = []
+        self.envmap = {}
+        self.watchers = {}
+        if prof:
+            self.setprofiler(prof)
         if not a == ():
             self.setargs(a)
 
     def __del__(self):
-        k = self.keys()
-        for l in k:
-            if self.file(l):
-                #       print "found file ", l
-                self.close(l)
+        self.closeall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, tb):
+        self.closeall()
+
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d["openfiles"] = []
+        d["prof"] = None
+        d["lock"] = None
+        return d
 
     def __repr__(self):
         if len(self) > 0:
-            lflag = ""
-            tl = self.longest() + 2
-            if tl > 3:
-                lflag = " "
-            tml = self.longestargtype()
-            tl = tl + tml
-            s = ""
-            t = self.keys()
-            for i in t:
-                ss = self.switch
-                ss = ss + i
-                astr = self.argtype(i)
-                if len(astr) < 1:
-                    s = s + "%s%s %s" % (
-                        string.rjust(self.switch + i + astr, tl),
-                        self.argparen,
-                        self.docstring(i),
-                    )
-                else:
-                    s = s + "%s%s %s" % (
-                        string.rjust(self.switch + i + lflag + astr, tl),
-                        self.argparen,
-                        self.docstring(i),
+            s = self.cache.get("repr")
+            if s == None:
+                tl = self.longest() + 2
+                lflag = ""
+                if tl > 3:
+                    lflag = " "
+                tl = tl + self.longestargtype()
+                lines = []
+                for i in self.keys():
+                    astr = self.argtype(i)
+                    if len(astr) > 0:
+                        astr = lflag + astr
+                    lines.append(
+                        "%s%s %s\n" % (string.rjust(self.switch + i + astr, tl), self.argparen, self.args[i].docstring)
                     )
-                s = s + "\n"
+                s = string.join(lines, "")
+                self.cache["repr"] = s
             return s
         return None
 
     def options(self):
-        k = self.keys()
-        s = "%s" % (self.switch)
-        sp = ""
-        n = 0
-        if self.longest() > 1:
-            sp = self.sep
-            s = s + "<"
-        for i in k:
-            if n < self.ne - 1:
-                s = s + i + sp
+        s = self.cache.get("options")
+        if s == None:
+            k = self.keys() or []
+            if self.longest() > 1:
+                sp = self.sep
+                if sp == None:
+                    sp = " "  # White space separates list items. ...
+                s = "%s<%s>" % (self.switch, string.join(k, sp))
             else:
-                s = s + i
-            n = n + 1
-        if self.longest() > 1:
-            s = s + ">"
+                s = self.switch + string.join(k, "")
+            self.cache["options"] = s
         return s
 
     def argtype(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            z = type(t["type"])
-            if z == type(None) or z == type(nofunc):
-                return ""
-            elif z == type(0j):
-                return "*"
-            elif z == type(0) or z == type(0L):
-                return "#"
-            elif z == type(0.0):
-                return "#.#"
-            elif z == type(nofile):
-                return "<file>"
-            elif z == type(()) or z == type([]):
-                return "<list>"
+        vt = valuetypes.get(self.type(let))
+        if vt:
+            return vt.hint
         return ""
 
     def has_key(self, let):
         return self.args.has_key(let)
 
     def additem(self, let, typ, str, v=None, mode="r"):
-        self.args[let] = {"type": typ, "docstring": str, "value": v, "mode": mode}
+        self.checkfrozen()
+        self.args[let] = option(typ, str, v, mode)
         self.ne = self.ne + 1
+        self.invalidate()
+
+    def invalidate(self):
+        self.lindex = None
+        self.cache = {}
+
+    def invalidatehelp(self):
+        for k in ("repr", "options", "toString"):
+            if self.cache.has_key(k):
+                del self.cache[k]
+
+    def freeze(self):
+        if self.lindex == None:
+            self.lindex = prefixindex(self.args.keys())
+        self.keys()
+        self.longest()
+        self.longestargtype()
+        self.frozen = 1
+        return self
+
+    def checkfrozen(self):
+        if self.frozen:
+            raise TypeError("arguments instance is frozen")
+
+    def compile(self, let):
+        t = self.args.get(let)
+        if t == None:
+            return None
+        return (t.conv, t.handler)
 
     def type(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            return type(t["type"])
-        return None
+        t = self.args.get(let)
+        if t == None:
+            return None
+        return t.kind
 
     def value(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            if type(t["value"]) == type(0j):
-                n = int(abs(t["value"]))
-                return n
-            else:
-                return t["value"]
-        return None
+        t = self.args.get(let)
+        if t == None:
+            return None
+        v = t.value
+        if type(v) == type(0j):
+            return int(abs(v))
+        return v
 
     def __getitem__(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            if type(t["value"]) == type(0j):
-                n = int(abs(t["value"]))
-                return n
-            else:
-                return t["value"]
-        return None
+        t = self.args.get(let)
+        if t == None:
+            return None
+        v = t.value
+        if type(v) == type(0j):
+            return int(abs(v))
+        return v
 
     def mode(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            return t["mode"]
-        return None
+        t = self.args.get(let)
+        if t == None:
+            return None
+        return t.mode
 
     def file(self, let):
-        if self.args.has_key(let) and self.type(let) == type(nofile):
-            t = self.args[let]
-            fname = t["value"]
-            mm = t["mode"]
-            if t.has_key("fp"):
-                fp = t["fp"]
-            else:
-                fp = None
-            return fname, mm, fp
+        t = self.args.get(let)
+        if t != None and t.kind == type(nofile):
+            return t.value, t.mode, getattr(t, "fp", None)
         return None
 
-    def open(self, let):
-        if self.args.has_key(let) and self.type(let) == type(nofile):
-            t = self.args[let]
-            fname = t["value"]
-            mm = t["mode"]
+    def open(self, let, prefetch=0):
+        #
+        # Files are opened on first use and the handle kept in the record.
+        # Those we opened ourselves (not the standard streams) are listed
+        # in self.openfiles, least recently used first; past self.fmax of
+        # them, the oldest is closed, and its position remembered so that
+        # the next open() can pick up where it left off.
+        #
+        # Once openall() or aopen() has set up self.lock, the bookkeeping
+        # is done holding it and the file is opened outside it, so that
+        # several threads can be opening files at once.  If two of them
+        # open the same option, the second to finish keeps the first's
+        # file and closes its own.
+        #
+        t = self.args.get(let)
+        if t == None or t.kind != type(nofile):
+            return None
+        lock = self.lock
+        if lock:
+            lock.acquire()
+        try:
+            if hasattr(t, "fp"):
+                if self.openfiles and self.openfiles[-1] != let and let in self.openfiles:
+                    self.openfiles.remove(let)
+                    self.openfiles.append(let)
+                return t.fp
+            fname = t.value
+            mm = t.mode
             if mm == None:
                 mm = "r"
-            if t.has_key("fp"):
-                return t["fp"]
-            else:
-                if fname == "stdin":
-                    fp = sys.stdin
-                elif fname == "stdout":
-                    fp = sys.stdout
-                elif fname == "stderr":
-                    fp = sys.stderr
-                else:
-                    fp = open(fname, mm)
-                return fp
-        return None
+            if fname == "stdin" or fname == "stdout" or fname == "stderr":
+                t.fp = getattr(sys, fname)
+                return t.fp
+            while self.fmax and len(self.openfiles) >= self.fmax:
+                self.evict(self.openfiles[0])
+            offset = getattr(t, "offset", None)
+            if offset != None:
+                del t.offset
+                if mm[:1] == "w":
+                    mm = "r+" + string.replace(mm[1:], "+", "")  # Don't truncate it twice. ...
+        finally:
+            if lock:
+                lock.release()
+        prof = self.prof
+        if prof:
+            t0 = prof.clock()
+        try:
+            fp = openfile(fname, mm, offset, prefetch)
+        except:
+            if offset != None:
+                t.offset = offset
+            raise
+        if prof:
+            prof.add("open", let, t0)
+        if lock:
+            lock.acquire()
+        try:
+            if hasattr(t, "fp"):
+                fp.close()
+                return t.fp
+            while self.fmax and len(self.openfiles) >= self.fmax:
+                self.evict(self.openfiles[0])
+            self.openfiles.append(let)
+            t.fp = fp
+        finally:
+            if lock:
+                lock.release()
+        return fp
+
+    def uselock(self):
+        if self.lock == None:
+            import threading
+
+            self.lock = threading.RLock()
+        return self.lock
+
+    def aopen(self, let, prefetch=0):
+        self.uselock()
+        return threadpool().apply_async(self.open, (let, prefetch))
+
+    def openall(self, lets=None, prefetch=0, workers=8):
+        if lets == None:
+            lets = []
+            for let in self.keys() or []:
+                t = self.args[let]
+                if t.kind == type(nofile) and t.value:
+                    lets.append(let)
+        if self.fmax:
+            lets = lets[: self.fmax]  # No sense opening what would be evicted at once. ...
+        self.uselock()
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(max(1, min(workers, len(lets))))
+        try:
+            pending = [(let, pool.apply_async(self.open, (let, prefetch))) for let in lets]
+            files = {}
+            err = None
+            for let, r in pending:
+                try:
+                    files[let] = r.get()
+                except EnvironmentError, e:
+                    if err == None:
+                        err = e
+        finally:
+            pool.close()
+            pool.join()
+        if err != None:
+            raise err
+        return files
+
+    def evict(self, let):
+        t = self.args[let]
+        try:
+            t.offset = t.fp.tell()
+        except IOError:
+            t.offset = None
+        self.close(let)
+        if t.offset == None:
+            del t.offset
 
     def close(self, let):
-        if self.args.has_key(let) and self.type(let) == type(nofile):
-            t = self.args[let]
-            if t.has_key("fp"):
-                fp = t["fp"]
-                if fp:
-                    fp.fflush()
-                    fp.close()
-                    fp = None
+        t = self.args.get(let)
+        if t != None and t.kind == type(nofile):
+            lock = self.lock
+            if lock:
+                lock.acquire()
+            try:
+                if hasattr(t, "fp"):
+                    fp = t.fp
+                    del t.fp
+                    if let in self.openfiles:
+                        self.openfiles.remove(let)
+                        if fp:
+                            fp.flush()
+                            fp.close()
+                    elif fp:
+                        fp.flush()  # A standard stream; leave it open. ...
+            finally:
+                if lock:
+                    lock.release()
+
+    def closeall(self):
+        for let in self.openfiles[:]:
+            self.close(let)
+        for t in self.args.values():
+            if hasattr(t, "fp"):
+                del t.fp
+            if hasattr(t, "offset"):
+                del t.offset
+
+    def maxfiles(self):
+        return self.fmax
+
+    def setmaxfiles(self, n):
+        self.fmax = n
+        while self.fmax and len(self.openfiles) > self.fmax:
+            self.evict(self.openfiles[0])
 
     def toString(self):
         if len(self) > 0:
-            lflag = ""
-            tl = self.longest() + 2
-            if tl > 3:
-                lflag = " "
-            s = ""
-            t = self.keys()
-            for i in t:
-                ss = self.switch
-                s = s + "%s %s" % (
-                    string.ljust(self.switch + i + lflag, tl),
-                    self.value(i),
-                )
-                s = s + "\n"
+            s = self.cache.get("toString")
+            if s == None:
+                tl = self.longest() + 2
+                lflag = ""
+                if tl > 3:
+                    lflag = " "
+                lines = []
+                for i in self.keys():
+                    lines.append("%s %s\n" % (string.ljust(self.switch + i + lflag, tl), self.value(i)))
+                s = string.join(lines, "")
+                self.cache["toString"] = s
             return s
         return ""
 
     def docstring(self, let):
-        if self.args.has_key(let):
-            t = self.args[let]
-            return t["docstring"]
-        return ""
+        t = self.args.get(let)
+        if t == None:
+            return ""
+        return t.docstring
 
     def __len__(self):
         return self.ne
 
     def keys(self):
         if len(self) > 0:
-            t = self.args.keys()
-            t.sort()
-            return t
+            t = self.cache.get("keys")
+            if t == None:
+                t = self.args.keys()
+                t.sort()
+                self.cache["keys"] = t
+            return t[:]
         return None
 
     def longest(self):
         if len(self) > 0:
-            t = self.keys()
-            tl = 0
-            for i in t:
-                if len(i) > tl:
-                    tl = len(i)
+            tl = self.cache.get("longest")
+            if tl == None:
+                tl = 0
+                for i in self.args.keys():
+                    if len(i) > tl:
+                        tl = len(i)
+                self.cache["longest"] = tl
             return tl
         return 0
 
     def longestargtype(self):
         if len(self) > 0:
-            t = self.keys()
-            tl = 0
-            for i in t:
-                tml = len(self.argtype(i))
-                if tml > tl:
-                    tl = tml
+            tl = self.cache.get("longestargtype")
+            if tl == None:
+                tl = 0
+                for i in self.args.keys():
+                    tml = len(self.argtype(i))
+                    if tml > tl:
+                        tl = tml
+                self.cache["longestargtype"] = tl
             return tl
         return 0
 
@@ -595,55 +2418,144 @@ class arguments:
         return self.switch
 
     def setswitch(self, c):
+        self.checkfrozen()
         self.switch = c
+        self.invalidatehelp()
 
     def sepchar(self):
         return self.sep
 
     def setsep(self, c):
+        self.checkfrozen()
         self.sep = c
+        self.invalidatehelp()
 
     def parenchar(self):
         return self.argparen
 
     def setparen(self, c):
+        self.checkfrozen()
         self.argparen = c
+        self.invalidatehelp()
 
     def eqchar(self):
         return self.argeq
 
     def seteq(self, c):
+        self.checkfrozen()
         self.argeq = c
 
+    def respchar(self):
+        return self.resp
+
+    def errormode(self):
+        return self.errmode
+
+    def seterrormode(self, m):
+        self.checkfrozen()
+        if m not in ("print", "collect", "raise"):
+            raise ValueError("error mode must be print, collect or raise, not %r" % (m,))
+        self.errmode = m
+
+    def watch(self, let, func):
+        addwatcher(self.watchers, let, func)
+
+    def unwatch(self, let, func=None):
+        dropwatcher(self.watchers, let, func)
+
+    def envvar(self, let):
+        return self.envmap.get(let)
+
+    def setenvvar(self, let, name):
+        self.checkfrozen()
+        if name == None:
+            if self.envmap.has_key(let):
+                del self.envmap[let]
+        else:
+            self.envmap[let] = name
+
+    def fail(self, e, errors, mode, now=0):
+        # Reports the argerror e as mode says: print it, or just add it to
+        # errors (which is always done), or, if now is true, raise it.
+        if errors != None:
+            errors.append(e)
+        if mode == "print":
+            print e
+        elif mode == "raise" and now:
+            raise e
+
+    def profiler(self):
+        return self.prof
+
+    def setprofiler(self, p=1):
+        if p and not isinstance(p, phasetimer):
+            p = phasetimer()
+        self.prof = p or None
+        return self.prof
+
+    def setresp(self, c):
+        self.checkfrozen()
+        self.resp = c
+
+    def callfunc(self, let):
+        mfc = self.value(let)
+        if mfc:
+            prof = self.prof
+            if prof:
+                t0 = prof.clock()
+            mfc(let)
+            if prof:
+                prof.add("callback", let, t0)
+
     def setvalue(self, c, v):
-        if self.has_key(c):
-            t = self.args[c]
-            if self.type(c) == type(nofile):
-                if type(v) == type(""):
-                    t["value"] = v
-                else:
-                    print "Value", type(v), "for keyletter", c, "must be", type("")
-            elif self.type(c) == type(None):
-                if v:
-                    t["value"] = 1
-                else:
-                    t["value"] = 0
-            elif self.type(c) == type(0j):
-                if (
-                    type(v) == type(0)
-                    or type(v) == type(0L)
-                    or type(v) == type(0j)
-                    or type(v) == type(0.0)
-                ):
-                    t["value"] = t["value"] + complex(v)
-                else:
-                    t["value"] = t["value"] + 1j
-            elif self.type(c) == type(v):
-                t["value"] = v
+        t = self.args.get(c)
+        if t != None:
+            self.checkfrozen()
+            ok, v = self.coerce(c, t, v, t.value)
+            if ok:
+                t.value = v
+                if self.cache.has_key("toString"):
+                    del self.cache["toString"]
             else:
-                print "Improper type", type(v), "for keyletter", c
+                self.fail(v, self.errors, self.errmode, 1)
+
+    def coerce(self, c, t, v, old):
+        # Checks v against the record t of option c; returns ( 1, value to
+        # store ), or ( 0, argerror ).  old is the value being replaced,
+        # which 0j counters add to.
+        if t.kind == type(nofile):
+            if type(v) == type(""):
+                return 1, v
+            return 0, argerror("type", "Value %s for keyletter %s must be %s" % (type(v), c, type("")), None, c, type(""), v)
+        elif t.kind == type(None):
+            if v:
+                return 1, 1
+            return 1, 0
+        elif t.kind == type(0j):
+            if (
+                type(v) == type(0)
+                or type(v) == type(0L)
+                or type(v) == type(0j)
+                or type(v) == type(0.0)
+            ):
+                return 1, old + complex(v)
+            return 1, old + 1j
+        elif t.kind == type(v):
+            return 1, v
+        elif isinstance(v, lazyseq) and v.kind == listkind(t):
+            return 1, v
+        elif isinstance(t.type, lazytype) and type(v) == t.type.kind:
+            return 1, v
+        elif isinstance(t.type, arraytype) and type(v) != type("") and hasattr(v, "__len__"):
+            a = checkarray(v, t.type.dtype)
+            if a is not None:
+                return 1, a
+        return 0, argerror("type", "Improper type %s for keyletter %s" % (type(v), c), None, c, t.kind, v)
 
     def setargs(self, list):
+        prof = self.prof
+        if prof:
+            t0 = prof.clock()
         for i in list:
             if type(i) == type(()):
                 if len(i) > 4:
@@ -652,492 +2564,840 @@ class arguments:
                     self.additem(i[0], i[1], i[2], i[3])
                 else:
                     self.additem(i[0], i[1], i[2])
+        if prof:
+            prof.add("setargs", None, t0)
 
     def matchlongarg(self, m):
-        k = self.keys()
-        kl = []
-        ms = 0
-        tl = 0
-        il = None
-        ss = None
+        if self.lindex == None:
+            self.lindex = prefixindex(self.args.keys())
         subarg = None
-        for j in k:
-            eq = string.find(m, self.argeq)
-            if eq > 0:
-                ss = m[:eq]
-                subarg = m[eq + 1 :]
-            else:
-                ss = m
-            r = string.find(j, ss)
-            if r == 0:  # Only looking for matches at beginning. ...
-                kl.append(j)
-                ms = ms + 1
-
-        #   print kl
-        if ms == 1:
-            if subarg:
-                return (kl[0], subarg)
-            else:
-                return kl[0]
-        elif ms > 1:
-            for ll in kl:
-                if m == ll:  # We look first for an exact match. ...
-                    il = ll
-                    break
-            else:  # Otherwise, look for the *longest* possible match. ...
-                for ll in kl:
-                    if len(ll) > tl:
-                        tl = len(ll)
-                        il = ll
-            if il != None:
-                if subarg:
-                    return (il, subarg)
+        eq = string.find(m, self.argeq)
+        if eq > 0:
+            ss = m[:eq]
+            subarg = m[eq + 1 :]
+        else:
+            ss = m
+        node = self.lindex.find(ss)  # Only looking for matches at beginning. ...
+        if node == None:
+            return None
+        if node[1] > 1 and self.args.has_key(m):
+            il = m  # We look first for an exact match. ...
+        else:
+            il = node[2]  # Otherwise, the *longest* possible match. ...
+        if subarg:
+            return (il, subarg)
+        return il
+
+    def getargs(self, argv, res=None):
+        if res == None:
+            return self.scan(argv, self)
+        res.progname, res.argv = self.scan(argv, res)
+        return res.progname, res.argv
+
+    def parse(self, argv, errmode=None):
+        res = parseresult(self, errmode)
+        self.getargs(argv, res)
+        return res
+
+    def parsemany(self, argvs, errmode=None):
+        for argv in argvs:
+            yield self.parse(argv, errmode)
+
+    def scan(self, argv, target):
+        target.errors = []
+        for t, let, v in self.events(argv, target.errors, target.errmode):
+            if t == None:
+                return argv[0], v
+            t.handler(target, let, v)
+
+    def getsources(self, argv, fname=None, environ=None, res=None, section=None):
+        #
+        # Sets options from the config file fname, then from the
+        # environment variables named by setenvvar(), then from argv; each
+        # source is ignored for the options a later one gives.  Values go
+        # through the option's converter and then its handler, as they do
+        # from the command line.
+        #
+        target = res
+        if target == None:
+            target = self
+        target.errors = errors = []
+        mode = target.errmode
+        found = []
+        given = {}
+        emode = mode
+        if mode == "raise":
+            emode = "collect"  # Raised below, with the rest. ...
+        for t, let, v in self.events(argv, errors, emode):
+            if t == None:
+                rest = v
+                break
+            found.append((t, let, v))
+            given[let] = 1
+        layer = {}
+        if fname:
+            try:
+                conf = readconfig(fname, section)
+            except (EnvironmentError, ValueError), e:
+                e = argerror("config", "Can't read config file %s: %s" % (fname, e), None, None, None, fname)
+                self.fail(e, errors, mode)
+                conf = {}
+            for k, v in conf.items():
+                if self.args.has_key(k):
+                    layer[k] = (v, fname)
                 else:
-                    return il
-        return None
-
-    def getargs(self, argv):
-        pn = argv[0]
-        argv = argv[1:]
-        n = len(argv)
-        contflag = 0
-        if n > 0:
-            for i in argv:
-                if contflag:
-                    contflag = contflag - 1
+                    self.fail(argerror("unlisted", "Unlisted keyword %s in %s" % (k, fname), None, k, None, v), errors, mode)
+        if environ == None:
+            import os
+
+            environ = os.environ
+        for let, name in self.envmap.items():
+            if environ.has_key(name) and self.args.has_key(let):
+                layer[let] = (environ[name], "$" + name)
+        lets = layer.keys()
+        lets.sort()
+        for let in lets:
+            if given.has_key(let):
+                continue
+            v, where = layer[let]
+            t = self.args[let]
+            try:
+                v = self.sourcevalue(t, v)
+            except ValueError:
+                e = argerror("type", "Bad value %r for keyword %s, type %s, from %s" % (v, let, t.kind, where), None, let, t.kind, v)
+                self.fail(e, errors, mode)
+                continue
+            t.handler(target, let, v)
+        for t, let, v in found:
+            t.handler(target, let, v)
+        if errors and mode == "raise":
+            raise argerrors(errors)
+        if res != None:
+            res.progname, res.argv = argv[0], rest
+        return argv[0], rest
+
+    def update(self, fragment, res=None):
+        #
+        # Applies fragment, options without a program name in front, to
+        # the values already set, and returns the keys whose values it
+        # changed, in the order they were given.  Nothing is applied if
+        # fragment has errors in "raise" mode.  The watchers of each
+        # changed key are called once everything has been applied.
+        #
+        target = res
+        if target == None:
+            target = self
+        target.errors = errors = []
+        mode = target.errmode
+        found = []
+        old = {}
+        lets = []
+        a = [None] + list(fragment)
+        for t, let, v in self.events(a, errors, mode):
+            if t == None:
+                for i in range(len(v)):
+                    e = argerror("unlisted", "Unexpected word %s" % (v[i]), len(a) - len(v) + i, None, None, v[i])
+                    self.fail(e, errors, mode)
+                if errors and mode == "raise":
+                    raise argerrors(errors)
+                break
+            found.append((t, let, v))
+            if not old.has_key(let):
+                old[let] = target.value(let)
+                lets.append(let)
+        for t, let, v in found:
+            t.handler(target, let, v)
+        changed = []
+        for let in lets:
+            new = target.value(let)
+            if not samevalue(old[let], new):
+                changed.append((let, old[let], new))
+        watchers = target.watchers
+        for let, was, new in changed:
+            for func in watchers.get(let, ()):
+                func(let, was, new)
+        return [c[0] for c in changed]
+
+    def sourcevalue(self, t, v):
+        # Turns v, a value from a config file or the environment, into
+        # what the parser would have found on the command line for the
+        # option with record t, or raises ValueError.
+        if type(v) == type(u""):
+            v = v.encode("utf-8")
+        if t.conv != None:
+            if type(v) == type(""):
+                return t.conv(v, self.sep)
+            if type(v) in (type(0), type(0L), type(0.0)):
+                return t.conv(str(v), self.sep)
+            if type(v) == type([]) and listkind(t) != None:
+                items = []
+                for i in v:
+                    if type(i) == type(u""):
+                        i = i.encode("utf-8")
+                    items.append(i)
+                return listkind(t)(items)
+            if type(v) == type([]) and isinstance(t.type, arraytype):
+                return v
+        elif t.kind == type(None):
+            if type(v) == type(""):
+                v = string.lower(string.strip(v))
+                if v in ("1", "true", "yes", "on"):
+                    return 1
+                if v in ("", "0", "false", "no", "off"):
+                    return 0
+            elif type(v) in (type(0), type(True)):
+                return v and 1 or 0
+        elif t.kind == type(0j):
+            if type(v) == type(""):
+                return convint(v, None)
+            if type(v) == type(0):
+                return v
+        raise ValueError(v)
+
+    def iterparse(self, argv, errors=None):
+        if errors == None:
+            errors = []
+            if not self.frozen:
+                self.errors = errors  # A frozen instance is only read. ...
+        for t, let, v in self.events(argv, errors, self.errmode):
+            yield let, v
+
+    def events(self, argv, errors=None, mode="print"):
+        #
+        # Yields ( record, key, value ) for each option found in argv, and
+        # finally ( None, None, remainder ).  What is wrong with argv goes
+        # to fail() with errors and mode; in "raise" mode, argerrors is
+        # raised instead of the last yield if there was anything.
+        #
+        # Tokens come from an argstream, which walks argv once with a
+        # cursor and reads response files as their words are needed;
+        # nothing is copied until the remainder is sliced off at the
+        # end.  Each option costs one lookup in self.args, whose record
+        # carries its converter, or for options that take no value its
+        # flag function.
+        #
+        resp = self.resp
+        prof = self.prof
+        a = argstream(argv, 1, errors, mode)
+        while 1:
+            i = a.peek()
+            if resp and i and i[0] == resp and len(i) > 1:
+                a.take()
+                self.respfile(a, i)
+                continue
+            if not i or i[0] != self.switch:
+                break
+            a.take()
+            #
+            # -----------Long Arguments--------------------------------------------------------------------
+            #
+            #  Allows either '-longarg value' OR '-longarg=value'.
+            if self.longest() > 1:
+                subarg = None
+                myi = i[1:]
+                if prof:
+                    t0 = prof.clock()
+                txa = self.matchlongarg(myi)
+                if txa and type(txa) == type(()):
+                    let = txa[0]
+                    subarg = txa[1]
+                else:
+                    let = txa
+                if prof:
+                    prof.add("match", let, t0)
+                if not let:
+                    self.fail(argerror("unlisted", "Unlisted keyword %s" % (myi), a.pos(), myi, None, i), errors, mode)
                     continue
-                if i[0] == self.switch:
-                    #
-                    # -----------Long Arguments--------------------------------------------------------------------
-                    #
-                    #  Allows either '-longarg value' OR '-longarg=value'.
-                    if self.longest() > 1:
-                        subarg = None
-                        myi = i[1:]
-                        txa = self.matchlongarg(myi)
-                        if txa and type(txa) == type(()):
-                            let = txa[0]
-                            subarg = txa[1]
-                        else:
-                            let = txa
-                        if let:
-                            t = self.args[let]
-
-                            # -----------Boolean---------------------------------------------------------------------------
-                            if self.type(let) == type(None):
-                                self.setvalue(let, 1)
-                            elif self.type(let) == type(0j):
-                                print "Long argument can't do autoincrementing; keyword %s, type %s" % (
-                                    let,
-                                    self.type(let),
-                                )
-                            # -----------Integer---------------------------------------------------------------------------
-                            elif self.type(let) == type(0):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i and isnumber(i):
-                                    tv = string.atoi(i)
-                                    self.setvalue(let, tv)
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv and argv[0]:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------Long------------------------------------------------------------------------------
-                            elif self.type(let) == type(0L):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i and islong(i):
-                                    if string.rfind(i, "L"):
-                                        t = i[:-1]
-                                    else:
-                                        t = i
-                                    tv = string.atol(t)
-                                    self.setvalue(let, tv)
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv and argv[0]:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------Float-----------------------------------------------------------------------------
-                            elif self.type(let) == type(0.0):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i and isfloat(i):
-                                    tv = string.atof(i)
-                                    self.setvalue(let, tv)
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv and argv[0]:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------String----------------------------------------------------------------------------
-                            elif self.type(let) == type(""):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i:
-                                    self.setvalue(let, i)
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv and argv[0]:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------File------------------------------------------------------------------------------
-                            elif self.type(let) == type(nofile):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i:
-                                    self.setvalue(let, i)  # Store the filename
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------Lists-----------------------------------------------------------------------------
-                            elif self.type(let) == type([]):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i:
-                                    tlist = string.splitfields(i, self.sep)
-                                    self.setvalue(let, tlist)  # Store the list
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------Tuples----------------------------------------------------------------------------
-                            elif self.type(let) == type(()):
-                                if subarg:
-                                    i = subarg
-                                else:
-                                    argv = argv[1:]
-                                    if argv:
-                                        i = argv[0]
-                                    else:
-                                        i = None
-                                if i:
-                                    tlist = tuple(string.splitfields(i, self.sep))
-                                    self.setvalue(let, tlist)  # Store the tuple
-                                    if not subarg:
-                                        argv = argv[1:]
-                                        if argv:
-                                            i = argv[0]
-                                        else:
-                                            i = None
-                                        contflag = 1
-                                else:
-                                    print "Missing value for keyword %s, type %s" % (
-                                        let,
-                                        self.type(let),
-                                    )
-                            # -----------Functions-------------------------------------------------------------------------
-                            elif self.type(let) == type(nofunc):
-                                mfc = self.value(let)
-                                if mfc:
-                                    mfc(let)
+                t = self.args[let]
+                if t.conv == None:
+                    try:
+                        v = t.flag(t, let, 1)
+                    except ValueError, e:
+                        e = argerror("flag", "%s; keyword %s, type %s" % (e, let, t.kind), a.pos(), let, t.kind, i)
+                        self.fail(e, errors, mode)
+                    else:
+                        if v != None:
+                            yield t, let, v
+                    continue
+                if subarg:
+                    i = subarg
+                else:
+                    i = a.peek()
+                    if resp and i and i[0] == resp:
+                        i = self.nextvalue(a, t)
+                tok = i
+                if i:
+                    if prof:
+                        t0 = prof.clock()
+                    try:
+                        if resp and i[0] == resp:
+                            v = self.convert(t, i)
                         else:
-                            print "Unlisted keyword %s" % (myi)
-
-                    # -----------Single-letter Arguments-----------------------------------------------------------
+                            v = t.conv(i, self.sep)
+                        if type(v) != t.kind and not self.coerce(let, t, v, None)[0]:
+                            raise ValueError(i)  # Reported here, with its position. ...
+                    except ValueError:
+                        i = None
+                    if prof:
+                        prof.add("convert", let, t0)
+                if not i:
+                    e = argerror("missing", "Missing value for keyword %s, type %s" % (let, t.kind), a.pos(), let, t.kind, tok)
+                    self.fail(e, errors, mode)
+                    continue
+                if not subarg:
+                    a.take()  # The value was the next token. ...
+                yield t, let, v
+                continue
+
+            # -----------Single-letter Arguments-----------------------------------------------------------
+            j = 1
+            for c in i[1:]:
+                j = j + 1
+                t = self.args.get(c)
+                if t == None:
+                    self.fail(argerror("unlisted", "Unlisted keyletter %s" % (c), a.pos(), c, None, i), errors, mode)
+                    continue
+                if t.conv == None:
+                    try:
+                        v = t.flag(t, c, 0)
+                    except ValueError, e:
+                        e = argerror("flag", "%s; keyletter %s, type %s" % (e, c, t.kind), a.pos(), c, t.kind, i)
+                        self.fail(e, errors, mode)
                     else:
-                        j = 1
-                        for c in i[1:]:
-                            if contflag:
-                                break
-                            if self.has_key(c):
-
-                                #
-                                # -----------Keyletter Arguments---------------------------------------------------------------
-                                #
-                                # -----------Boolean---------------------------------------------------------------------------
-                                if self.type(c) == type(None):
-                                    self.setvalue(c, 1)
-                                elif self.type(c) == type(0j):
-                                    self.setvalue(c, 1)
-
-                                # -----------Integer---------------------------------------------------------------------------
-                                elif self.type(c) == type(0):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        tv = string.atoi(rs)
-                                        self.setvalue(c, tv)
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i and isnumber(i):
-                                            tv = string.atoi(i)
-                                            self.setvalue(c, tv)
-                                            argv = argv[1:]
-                                            if argv and argv[0]:
-                                                i = argv[0]
-                                            else:
-                                                i = None
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------Long------------------------------------------------------------------------------
-                                elif self.type(c) == type(0L):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        tv = string.atol(rs)
-                                        self.setvalue(c, tv)
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i and islong(i):
-                                            if string.rfind(i, "L"):
-                                                t = i[:-1]
-                                            else:
-                                                t = i
-                                            tv = string.atol(t)
-                                            self.setvalue(c, tv)
-                                            argv = argv[1:]
-                                            if argv and argv[0]:
-                                                i = argv[0]
-                                            else:
-                                                i = None
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------Float-----------------------------------------------------------------------------
-                                elif self.type(c) == type(0.0):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        tv = string.atof(rs)
-                                        self.setvalue(c, tv)
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i and isfloat(i):
-                                            tv = string.atof(i)
-                                            self.setvalue(c, tv)
-                                            argv = argv[1:]
-                                            if argv and argv[0]:
-                                                i = argv[0]
-                                            else:
-                                                i = None
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------String----------------------------------------------------------------------------
-                                elif self.type(c) == type(""):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        self.setvalue(c, rs)
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i:
-                                            self.setvalue(c, i)
-                                            argv = argv[1:]
-                                            if argv and argv[0]:
-                                                i = argv[0]
-                                            else:
-                                                i = None
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------File------------------------------------------------------------------------------
-                                elif self.type(c) == type(nofile):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        self.setvalue(c, rs)  # Store the filename
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i:
-                                            self.setvalue(c, i)  # Store the filename
-                                            argv = argv[1:]
-                                            if argv:
-                                                i = argv[0]
-                                            else:
-                                                pass
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------Lists-----------------------------------------------------------------------------
-                                elif self.type(c) == type([]):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        tlist = string.splitfields(rs, self.sep)
-                                        self.setvalue(c, tlist)  # Store the list
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i:
-                                            tlist = string.splitfields(i, self.sep)
-                                            self.setvalue(c, tlist)  # Store the list
-                                            argv = argv[1:]
-                                            if argv:
-                                                i = argv[0]
-                                            else:
-                                                pass
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------Tuples----------------------------------------------------------------------------
-                                elif self.type(c) == type(()):
-                                    rs = i[j + 1 :]  # Allow for keyletter itself
-                                    if len(rs) > 0:
-                                        tlist = tuple(string.splitfields(rs, self.sep))
-                                        self.setvalue(c, tlist)  # Store the tuple
-                                        break
-                                    else:
-                                        argv = argv[1:]
-                                        i = argv[0]
-                                        if i:
-                                            tlist = tuple(
-                                                string.splitfields(i, self.sep)
-                                            )
-                                            self.setvalue(c, tlist)  # Store the tuple
-                                            argv = argv[1:]
-                                            if argv:
-                                                i = argv[0]
-                                            else:
-                                                pass
-                                            contflag = 1
-                                            break
-                                        else:
-                                            print "Missing value for keyletter %s, type %s" % (
-                                                c,
-                                                self.type(c),
-                                            )
-
-                                # -----------Functions-------------------------------------------------------------------------
-                                elif self.type(c) == type(nofunc):
-                                    mfc = self.value(c)
-                                    if mfc:
-                                        mfc(c)
-                            else:
-                                print "Unlisted keyletter %s" % (c)
-                            j = j + 1
-
-                    if contflag:
-                        continue
-                    argv = argv[1:]
+                        if v != None:
+                            yield t, c, v
+                    continue
+                rs = i[j:]  # Allow for keyletter itself
+                if rs:
+                    v = rs
                 else:
+                    v = a.peek()
+                    if resp and v and v[0] == resp:
+                        v = self.nextvalue(a, t)
+                tok = v
+                if v:
+                    if prof:
+                        t0 = prof.clock()
+                    try:
+                        if resp and v[0] == resp:
+                            tv = self.convert(t, v)
+                        else:
+                            tv = t.conv(v, self.sep)
+                        if type(tv) != t.kind and not self.coerce(c, t, tv, None)[0]:
+                            raise ValueError(v)
+                    except ValueError:
+                        v = None
+                    if prof:
+                        prof.add("convert", c, t0)
+                if not v:
+                    e = argerror("missing", "Missing value for keyletter %s, type %s" % (c, t.kind), a.pos(), c, t.kind, tok)
+                    self.fail(e, errors, mode)
                     break
-        return pn, argv
+                if not rs:
+                    a.take()  # The value was the next token. ...
+                yield t, c, tv
+                break
+        if errors and mode == "raise":
+            raise argerrors(errors)
+        yield None, None, a.rest()
+
+    def nextvalue(self, a, t):
+        # Peeks at the token that would be the value of option t, opening
+        # any response files in the way, except that a list or tuple
+        # option takes a response file as its value whole.
+        i = a.peek()
+        while i and i[0] == self.resp and len(i) > 1 and listkind(t) == None:
+            a.take()
+            self.respfile(a, i)
+            i = a.peek()
+        return i
+
+    def respfile(self, a, i):
+        try:
+            a.expand(i[1:])
+        except (EnvironmentError, ValueError), e:
+            e = argerror("respfile", "Can't read response file %s: %s" % (i[1:], e), a.pos(), None, None, i)
+            self.fail(e, a.errors, a.mode)
+
+    def convert(self, t, s):
+        kind = listkind(t)
+        if s[0] == self.resp and len(s) > 1 and kind != None:
+            try:
+                return respseq(s[1:], self.sep, kind)
+            except EnvironmentError:
+                raise ValueError(s)
+        return t.conv(s, self.sep)
 
 
 def manpage():
     return __doc__
 
 
+#
+# Bulk validation.  The parent process only reads records; splitting them
+# into words and parsing happens in the pool, one block of records per
+# task, with at most a few blocks per process outstanding so that memory
+# stays flat however long the input is.
+#
+checkspec = None
+
+
+class checkresult(parseresult):
+    # Records function options instead of calling them.
+    __slots__ = ()
+
+    def callfunc(self, let):
+        self.values[let] = 1
+
+
+def checkinit(spec):
+    global checkspec
+    checkspec = spec
+
+
+def checkline(spec, n, line):
+    import shlex
+
+    argv = None
+    values = {}
+    rest = None
+    res = None
+    try:
+        argv = shlex.split(line)
+        res = checkresult(spec, "collect")
+        spec.getargs(argv, res)
+        values = res.values
+        rest = res.argv
+        errors = res.errors
+    except Exception, e:
+        errors = []
+        if res != None:
+            errors = res.errors[:]
+        errors.append(argerror("exception", "%s: %s" % (e.__class__.__name__, e)))
+    return (n, argv, values, rest, errors)
+
+
+def checkblock(block):
+    n, lines = block
+    r = []
+    for line in lines:
+        if string.strip(line):
+            r.append(checkline(checkspec, n, line))
+        n = n + 1
+    return r
+
+
+def readrecords(fp, nul=0):
+    if not nul:
+        for line in fp:
+            if line[-1:] == "\n":
+                line = line[:-1]
+            if line[-1:] == "\r":
+                line = line[:-1]
+            yield line
+        return
+    tail = ""
+    while 1:
+        buf = fp.read(65536)
+        if not buf:
+            break
+        recs = string.split(tail + buf, "\0")
+        tail = recs.pop()
+        for rec in recs:
+            yield rec
+    if tail:
+        yield tail
+
+
+def readblocks(fp, nul=0, size=1000):
+    n = 1
+    block = []
+    for rec in readrecords(fp, nul):
+        block.append(rec)
+        if len(block) >= size:
+            yield (n, block)
+            n = n + len(block)
+            block = []
+    if block:
+        yield (n, block)
+
+
+def validate(spec, fp, procs=None, nul=0, size=1000):
+    import multiprocessing
+
+    if procs == None:
+        procs = multiprocessing.cpu_count()
+    if procs < 2:
+        checkinit(spec)
+        for block in readblocks(fp, nul, size):
+            for r in checkblock(block):
+                yield r
+        return
+    pool = multiprocessing.Pool(procs, checkinit, (spec,))
+    pending = []
+    try:
+        for block in readblocks(fp, nul, size):
+            pending.append(pool.apply_async(checkblock, (block,)))
+            while len(pending) > 2 * procs or (pending and pending[0].ready()):
+                for r in pending.pop(0).get():
+                    yield r
+        while pending:
+            for r in pending.pop(0).get():
+                yield r
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+#
+# Spec caches.  A spec is dumped as a marshal string holding everything
+# setargs() and the first parse would work out: the option records, the sorted keys, the
+# widths __repr__ uses and the prefixindex trie.  Values marshal can't
+# hold are written as references: the sentinels by name, functions as
+# ( module, name ).  The digest is of repr ( arglist ) with the " at
+# 0x..." addresses taken out of the reprs of functions and other objects,
+# which is quick to work out and the same from one run to the next, and
+# of those references, since the repr of a function doesn't say which
+# module it is in: a callback saved as __main__.help, when the program is
+# run as a script, must not be looked for there when it is imported.
+#
+specmagic = "getargs spec 3"
+simpletypes = {}
+for i in (None, 0, 0L, 0.0, 0j, "", u"", True):
+    simpletypes[type(i)] = 1
+del i
+
+
+def specref(v):
+    # Returns the ( module, name ) v can be found by again, or None.
+    for name in ("nofile", "intarray", "floatarray", "lazylist", "lazytuple"):
+        if v is globals()[name]:
+            return (__name__, name)
+    mod = getattr(v, "__module__", None)
+    name = getattr(v, "__name__", None)
+    if mod and name and getattr(sys.modules.get(mod), name, None) is v:
+        return (mod, name)
+    return None
+
+
+def specencode(v):
+    if simpletypes.has_key(type(v)):
+        return ("v", v)
+    import marshal
+
+    if isinstance(v, lazyseq):
+        v = v.kind(v)
+    try:
+        marshal.dumps(v)
+    except ValueError:
+        r = specref(v)
+        if r == None:
+            raise ValueError("can't save %r in a spec cache" % (v,))
+        return ("r", r)
+    return ("v", v)
+
+
+def specdecode(e):
+    if e[0] == "r":
+        mod, name = e[1]
+        if not sys.modules.has_key(mod):
+            __import__(mod)
+        return getattr(sys.modules[mod], name)
+    return e[1]
+
+
+def specdigest(c, arglist):
+    import re
+
+    try:
+        import _md5  # Much quicker to import than hashlib. ...
+
+        md5 = _md5.new
+    except ImportError:
+        import hashlib
+
+        md5 = hashlib.md5
+    s = re.sub(r" at 0x[0-9A-Fa-f]+>", ">", repr(arglist))
+    refs = []
+    for i in arglist:
+        if type(i) == type(()):
+            for v in i:
+                if not simpletypes.has_key(type(v)) and hasattr(v, "__name__"):
+                    refs.append(specref(v))
+    return md5("%s\0%s\0%s\0%r" % (specmagic, c, s, refs)).hexdigest()
+
+
+def specdump(xarg, digest=None):
+    import marshal
+
+    options = []
+    hints = {}
+    for let, t in xarg.args.items():
+        options.append((let, specencode(t.type), t.docstring, specencode(t.value), t.mode))
+        hints[let] = (xarg.argtype(let), t.conv != None)
+    if xarg.lindex == None:
+        xarg.lindex = prefixindex(xarg.args.keys())
+    state = {
+        "switch": xarg.switch,
+        "sep": xarg.sep,
+        "argparen": xarg.argparen,
+        "argeq": xarg.argeq,
+        "resp": xarg.resp,
+        "errmode": xarg.errmode,
+        "fmax": xarg.fmax,
+        "options": options,
+        "keys": xarg.keys() or [],
+        "longest": xarg.longest(),
+        "longestargtype": xarg.longestargtype(),
+        "trie": xarg.lindex.root,
+        "hints": hints,
+        "envmap": xarg.envmap,
+    }
+    return marshal.dumps((specmagic, digest, state))
+
+
+def specload(data, digest=None):
+    import marshal
+
+    try:
+        magic, d, state = marshal.loads(data)
+    except (ValueError, EOFError, TypeError):
+        return None
+    if magic != specmagic or (digest != None and d != digest):
+        return None
+    xarg = arguments(state["switch"])
+    args = xarg.args
+    for let, typ, doc, v, mode in state["options"]:
+        if typ[0] == "v" and v[0] == "v":
+            args[let] = option(typ[1], doc, v[1], mode)
+        else:
+            try:
+                args[let] = option(specdecode(typ), doc, specdecode(v), mode)
+            except (ImportError, AttributeError):
+                return None  # Saved from a different program. ...
+    xarg.ne = len(args)
+    xarg.sep = state["sep"]
+    xarg.argparen = state["argparen"]
+    xarg.argeq = state["argeq"]
+    xarg.resp = state["resp"]
+    xarg.errmode = state["errmode"]
+    xarg.fmax = state["fmax"]
+    xarg.envmap = state["envmap"]
+    xarg.lindex = prefixindex()
+    xarg.lindex.root = state["trie"]
+    if xarg.ne:
+        xarg.cache["keys"] = state["keys"]
+        xarg.cache["longest"] = state["longest"]
+        xarg.cache["longestargtype"] = state["longestargtype"]
+    return xarg
+
+
+def speccache(fname, c, arglist):
+    digest = specdigest(c, arglist)
+    try:
+        fp = open(fname, "rb")
+        try:
+            xarg = specload(fp.read(), digest)
+        finally:
+            fp.close()
+        if xarg != None:
+            return xarg
+    except EnvironmentError:
+        pass
+    xarg = arguments(c, arglist)
+    try:
+        data = specdump(xarg, digest)
+    except ValueError:
+        return xarg  # Something in arglist can't be saved. ...
+    writefile(fname, data)
+    return xarg
+
+
+def writefile(fname, data):
+    # Writes data to fname through a temporary file renamed into place, so
+    # that a reader never sees half a file; returns 0 if it can't.
+    import os
+
+    tmp = "%s.%d.tmp" % (fname, os.getpid())
+    try:
+        fp = open(tmp, "wb")
+        try:
+            fp.write(data)
+        finally:
+            fp.close()
+        os.rename(tmp, fname)
+    except EnvironmentError:
+        try:
+            os.remove(tmp)
+        except EnvironmentError:
+            pass
+        return 0
+    return 1
+
+
+#
+# Shell completion.  A completion query reads the state specdump() wrote
+# and walks its trie; no arguments instance is built.  hints maps each
+# key to ( argtype, whether the option takes a value ).
+#
+def compindex(fname):
+    import marshal
+
+    try:
+        fp = open(fname, "rb")
+        try:
+            magic, d, state = marshal.loads(fp.read())
+        finally:
+            fp.close()
+    except (EnvironmentError, ValueError, EOFError, TypeError):
+        return None
+    if magic != specmagic:
+        return None
+    return state
+
+
+def compkeys(node, prefix):
+    # The keys at or below node, which prefix leads to, in sorted order.
+    # A key ends at a node whose count is more than its children's.
+    keys = []
+    stack = [(node, prefix)]
+    while stack:
+        node, prefix = stack.pop()
+        n = node[1]
+        for c, kid in node[0].items():
+            n = n - kid[1]
+            stack.append((kid, prefix + c))
+        if n > 0:
+            keys.append(prefix)
+    keys.sort()
+    return keys
+
+
+def complete(state, word, prev=None):
+    switch = state["switch"]
+    argeq = state["argeq"]
+    longmode = state["longest"] > 1
+    if switch and word[: len(switch)] == switch:
+        body = word[len(switch) :]
+        if not longmode:
+            return None, [switch + k for k in state["keys"] if string.find(switch + k, word) == 0]
+        eq = -1
+        if argeq:
+            eq = string.find(body, argeq)
+        if eq > 0:
+            return compvalue(state, body[:eq])
+        node = state["trie"]
+        for c in body:
+            node = node[0].get(c)
+            if node == None:
+                return None, []
+        return None, [switch + k for k in compkeys(node, body)]
+    if prev and switch and prev[: len(switch)] == switch and not (argeq and string.find(prev, argeq) > 0):
+        if longmode:
+            return compvalue(state, prev[len(switch) :])
+        return compvalue(state, prev[-1:])
+    return None, []
+
+
+def compvalue(state, s):
+    # What complete() returns for the value of option s, matched the way
+    # matchlongarg() would match it.
+    hints = state["hints"]
+    node = state["trie"]
+    for c in s:
+        node = node[0].get(c)
+        if node == None:
+            return None, []
+    if node[1] < 1:
+        return None, []
+    if node[1] > 1 and hints.has_key(s):
+        let = s
+    else:
+        let = node[2]
+    hint, takes = hints.get(let, ("", 0))
+    if not takes:
+        return None, []
+    return hint, []
+
+
+def compscript(shell, prog, cachefile, python=None):
+    import os
+    import re
+
+    if python == None:
+        python = sys.executable
+    home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def quote(s):
+        return "'" + string.replace(s, "'", "'\\''") + "'"
+
+    name = "_getargs_" + re.sub(r"\W", "_", prog)
+    run = "PYTHONPATH=%s${PYTHONPATH:+:$PYTHONPATH} %s -m getargs -complete %s :" % (
+        quote(home),
+        quote(python),
+        quote(os.path.abspath(cachefile)),
+    )
+    if shell == "bash":
+        return """%(name)s() {
+    local cur=${COMP_WORDS[COMP_CWORD]}
+    local IFS=$'\\n'
+    local out
+    out=($(%(run)s "${COMP_WORDS[@]:1:COMP_CWORD}" 2>/dev/null)) || return 1
+    COMPREPLY=()
+    case ${out[0]} in
+    "-")
+        COMPREPLY=("${out[@]:1}") ;;
+    "=<file>")
+        COMPREPLY=($(compgen -f -- "${cur#*=}")) ;;
+    "=")
+        ;;
+    "="*)
+        compopt +o default 2>/dev/null
+        if [[ -z ${cur#*=} ]]; then
+            COMPREPLY=("${out[0]#=}" "")
+        fi ;;
+    esac
+}
+complete -o default -F %(name)s %(prog)s
+""" % {
+            "name": name,
+            "run": run,
+            "prog": quote(prog),
+        }
+    if shell == "zsh":
+        return """#compdef %(prog)s
+%(name)s() {
+    local -a out
+    out=("${(@f)$(%(run)s "${(@)words[2,CURRENT]}" 2>/dev/null)}")
+    local hint=$out[1]
+    out=("${(@)out[2,-1]}")
+    case $hint in
+    ("-")
+        if (( $#out )); then
+            compadd -- "${(@)out}"
+        else
+            _default
+        fi ;;
+    ("=<file>")
+        _files ;;
+    ("=")
+        _default ;;
+    ("="*)
+        _message -r "${hint#=}" ;;
+    (*)
+        _default ;;
+    esac
+}
+compdef %(name)s %(prog)s
+""" % {
+            "name": name,
+            "run": run,
+            "prog": quote(prog),
+        }
+    raise ValueError("no completion script for shell %s" % (shell))
+
+
 if __name__ == "__main__":
 
     def printversion(l):
@@ -0,0 +1,127 @@
+#
+# python -m getargs -spec module:name [options] [file]
+#
+# Checks every command line in file (or on stdin) against an arglist, as
+# getargs.validate() does, and prints one line per bad command line:
+#
+#   lineno<TAB>error<TAB>complaint[; complaint...]
+#
+# With -all, good lines are printed too, as lineno<TAB>ok<TAB>values.
+# The exit status is 1 if any line was bad.
+#
+# python -m getargs -spec module:name -shell bash|zsh -cache file [-prog name]
+#
+# Saves the arglist in the spec cache file and prints a completion function
+# for the program name (default: module) that reads it.  The function runs
+#
+# python -m getargs -complete file : word...
+#
+# with the words of the command line after the program name, up to the one
+# being completed, and gets back a line saying what is being completed
+# ("-" for options, "=" and the argtype() hint for an option's value), then
+# one line per candidate.
+#
+
+import sys
+import os
+import string
+
+import getargs
+
+
+def loadspec(name, switch, sep):
+    if string.find(name, ":") < 0:
+        raise ValueError("spec must be given as module:name, not %s" % (name))
+    modname, attr = string.split(name, ":", 1)
+    sys.path.insert(0, os.getcwd())
+    mod = __import__(modname, globals(), locals(), [attr])
+    spec = getattr(mod, attr)
+    if not isinstance(spec, getargs.arguments):
+        spec = getargs.arguments(switch, spec)
+        if sep != None:
+            spec.setsep(sep)
+    return spec.freeze()
+
+
+def completemain(args):
+    # Answers a query from a function compscript() wrote.  bash splits
+    # -name=value into three words, which are put back together here.
+    if not args:
+        return 2
+    state = getargs.compindex(args[0])
+    if state == None:
+        return 1
+    words = args[1:]
+    if words[:1] == [":"]:
+        words = words[1:]
+    argeq = state["argeq"]
+    joined = []
+    for w in words:
+        if joined and argeq and (w == argeq or joined[-1][-len(argeq) :] == argeq):
+            joined[-1] = joined[-1] + w
+        else:
+            joined.append(w)
+    word = ""
+    prev = None
+    if joined:
+        word = joined[-1]
+    if len(joined) > 1:
+        prev = joined[-2]
+    hint, candidates = getargs.complete(state, word, prev)
+    if hint == None:
+        lines = ["-"] + candidates
+    else:
+        lines = ["=" + hint]
+    sys.stdout.write(string.join(lines, "\n") + "\n")
+    return 0
+
+
+def main(argv):
+    if argv[1:2] == ["-complete"]:
+        return completemain(argv[2:])  # No arguments instance is built.
+    arglist = (
+        ("spec", "", "The arglist to check against, as module:name", None),
+        ("procs", 0, "Number of worker processes (default: one per CPU)", None),
+        ("nul", None, "Command lines are NUL-terminated", 0),
+        ("all", None, "Report good command lines too", 0),
+        ("switch", "", "Switch character, if spec names an arglist", "-"),
+        ("sep", "", "List separator, if spec names an arglist", None),
+        ("block", 0, "Command lines per task", 1000),
+        ("shell", "", "Print a bash or zsh completion function", None),
+        ("cache", "", "Spec cache file the completion function reads", None),
+        ("prog", "", "Program the completion function is for", None),
+    )
+    xarg = getargs.arguments("-", arglist)
+    progname, argv = xarg.getargs(argv)
+    if not xarg.value("spec"):
+        print "Usage: python -m getargs -spec module:name [options] [file]\n%s" % (xarg),
+        return 2
+    spec = loadspec(xarg.value("spec"), xarg.value("switch"), xarg.value("sep"))
+    if xarg.value("shell"):
+        if not xarg.value("cache"):
+            print "%s: -shell needs -cache" % (progname)
+            return 2
+        fp = open(xarg.value("cache"), "wb")
+        fp.write(getargs.specdump(spec))
+        fp.close()
+        prog = xarg.value("prog") or string.split(xarg.value("spec"), ":")[0]
+        sys.stdout.write(getargs.compscript(xarg.value("shell"), prog, xarg.value("cache")))
+        return 0
+    if argv:
+        fp = open(argv[0], "rb")
+    else:
+        fp = sys.stdin
+    bad = 0
+    for n, words, values, rest, errors in getargs.validate(
+        spec, fp, xarg.value("procs"), xarg.value("nul"), xarg.value("block")
+    ):
+        if errors:
+            bad = 1
+            sys.stdout.write("%d\terror\t%s\n" % (n, string.join(map(str, errors), "; ")))
+        elif xarg.value("all"):
+            sys.stdout.write("%d\tok\t%r\n" % (n, values))
+    return bad
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))